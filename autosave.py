@@ -0,0 +1,136 @@
+import os
+import queue
+import threading
+import time
+import contraption
+
+# Crash recovery: a compacted snapshot (game text format) plus an append-only journal of
+# edits made since. Each journal entry is a group of "-,<row>" (removed) and "+,<row>"
+# (added) lines closed by a "." line; rows are object_id,skin,grid_x,grid_y,rotation,mirror
+# in editor orientation. A group without its closing line is ignored on replay.
+SNAPSHOT_NAME = 'snapshot.txt'
+JOURNAL_NAME = 'journal.log'
+
+
+def format_entry(removed, added):
+    # removed/added: row tuples or (n, 6) NumPy tables (see Grid.column_table)
+    removed = removed.tolist() if hasattr(removed, 'tolist') else removed
+    added = added.tolist() if hasattr(added, 'tolist') else added
+    lines = [f"-,{o},{s},{x},{y},{r},{int(m)}\n" for o, s, x, y, r, m in removed]
+    lines += [f"+,{o},{s},{x},{y},{r},{int(m)}\n" for o, s, x, y, r, m in added]
+    lines.append(".\n")
+    return ''.join(lines)
+
+
+def read_journal(path):
+    # Complete (removed, added) groups in order; a torn last group is dropped
+    entries = []
+    removed, added = [], []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line == '.':
+                entries.append((removed, added))
+                removed, added = [], []
+                continue
+            fields = line.split(',')
+            if len(fields) != 7 or fields[0] not in ('-', '+'):
+                break  # Torn write: everything after it is unreliable
+            try:
+                object_id, skin, grid_x, grid_y, rotation, mirror = (int(value) for value in fields[1:])
+            except ValueError:
+                break
+            row = (object_id, skin, grid_x, grid_y, rotation, bool(mirror))
+            (removed if fields[0] == '-' else added).append(row)
+    return entries
+
+
+class Autosave:
+    # Journals grid edits and periodically compacts them into a snapshot. All file I/O
+    # happens on one worker thread, in the order it was requested.
+    def __init__(self, directory, flush_interval=2.0, snapshot_interval=60.0):
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_NAME)
+        self.journal_path = os.path.join(directory, JOURNAL_NAME)
+        self.flush_interval = flush_interval
+        self.snapshot_interval = snapshot_interval
+        self.pending = []  # Journal text not yet handed to the worker
+        self.entries_since_snapshot = 0
+        self.last_flush = time.monotonic()
+        self.last_snapshot = time.monotonic()
+        self.tasks = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def has_recovery(self):
+        return os.path.exists(self.snapshot_path) or (os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > 0)
+
+    def recover(self, grid):
+        # Rebuild the grid from snapshot + journal; returns the number of replayed edits
+        if os.path.exists(self.snapshot_path):
+            grid.load(self.snapshot_path)
+        entries = read_journal(self.journal_path) if os.path.exists(self.journal_path) else []
+        for removed, added in entries:
+            grid.apply_delta(removed, added)
+        grid.dirty = True
+        self.entries_since_snapshot = len(entries)
+        return len(entries)
+
+    def record(self, removed, added):
+        # Grid edit listener: cheap, only buffers text until the next flush
+        self.pending.append(format_entry(removed, added))
+        self.entries_since_snapshot += 1
+
+    def tick(self, grid):
+        now = time.monotonic()
+        if self.pending and now - self.last_flush >= self.flush_interval:
+            self.flush()
+        if self.entries_since_snapshot and now - self.last_snapshot >= self.snapshot_interval:
+            self.snapshot(grid)
+
+    def flush(self):
+        if self.pending:
+            self.tasks.put(('append', ''.join(self.pending)))
+            self.pending = []
+        self.last_flush = time.monotonic()
+
+    def snapshot(self, grid):
+        # Everything journaled so far is queued before the snapshot, so the worker can
+        # truncate the journal once the snapshot is on disk
+        self.flush()
+        self.tasks.put(('snapshot', grid.snapshot_rows()))
+        self.entries_since_snapshot = 0
+        self.last_snapshot = time.monotonic()
+
+    def discard(self):
+        # Nothing worth recovering (clean exit or everything saved): drop snapshot and journal
+        self.pending = []
+        self.entries_since_snapshot = 0
+        self.tasks.put(('discard', None))
+
+    def close(self):
+        self.tasks.put(None)
+        self.thread.join()
+
+    def run(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                return
+            kind, payload = task
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                if kind == 'append':
+                    with open(self.journal_path, 'a') as f:
+                        f.write(payload)
+                        f.flush()
+                        os.fsync(f.fileno())
+                elif kind == 'snapshot':
+                    contraption.write_rows(self.snapshot_path, payload)
+                    open(self.journal_path, 'w').close()
+                elif kind == 'discard':
+                    for path in (self.snapshot_path, self.journal_path):
+                        if os.path.exists(path):
+                            os.remove(path)
+            except OSError as e:
+                print(f"Autosave {kind} failed: {e}")
@@ -0,0 +1,107 @@
+import argparse
+import fnmatch
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from main import Grid
+
+# Headless batch processing of contraption files: every file is loaded into a Grid without
+# textures, edited with the same selection transforms as the editor, and saved again.
+# Usage: python batch.py INPUT_DIR OUTPUT_DIR [--rotate N] [--mirror] [--translate DX DY]
+#        [--drop-unknown] [--dedupe] [--allow-errors] [--workers N] [--pattern GLOB]
+
+
+def process_file(source, target, options):
+    # Runs in a worker process; returns a summary dict instead of raising
+    stats = {"file": os.path.basename(source), "parts_in": 0, "parts_out": 0, "parse_errors": 0, "unknown": 0,
+             "duplicates": 0, "error": None}
+    try:
+        grid = Grid(headless=True)
+        grid.load(source)
+        stats["parts_in"] = sum(len(layer) for layer in grid.parts_in_grid)
+        stats["parse_errors"] = grid.last_load_stats["errors"]
+        # Saving would silently drop the unparsable lines, and in place that destroys the file
+        if stats["parse_errors"] and not options["allow_errors"]:
+            stats["error"] = f"{stats['parse_errors']} unparsable line(s), not written (see --allow-errors)"
+            return stats
+        unknown = grid.unknown_parts()
+        stats["unknown"] = len(unknown)
+        stats["unknown_ids"] = sorted({part.object_id for part in unknown})
+        if options["drop_unknown"] and unknown:
+            grid.remove_parts(unknown)
+        if options["dedupe"]:
+            duplicates = grid.overlapping_parts()
+            stats["duplicates"] = len(duplicates)
+            grid.remove_parts(duplicates)
+        grid.select_all()
+        for _ in range(options["rotate"] % 4):
+            grid.rotate_selected()
+        if options["mirror"]:
+            grid.flip_selected()
+        grid.translate_selected(*options["translate"])
+        grid.save(target)
+        stats["parts_out"] = sum(len(layer) for layer in grid.parts_in_grid)
+    except Exception as e:
+        stats["error"] = f"{type(e).__name__}: {e}"
+    return stats
+
+
+def find_files(directory, pattern):
+    return sorted(name for name in os.listdir(directory)
+                  if fnmatch.fnmatch(name, pattern) and os.path.isfile(os.path.join(directory, name)))
+
+
+def print_summary(results, seconds):
+    failed = [stats for stats in results if stats["error"]]
+    print(f"\n{'file':<40}{'in':>9}{'out':>9}{'errors':>9}{'unknown':>9}{'dupes':>9}")
+    for stats in results:
+        if stats["error"]:
+            print(f"{stats['file']:<40}  FAILED {stats['error']}")
+        else:
+            print(f"{stats['file']:<40}{stats['parts_in']:>9}{stats['parts_out']:>9}{stats['parse_errors']:>9}"
+                  f"{stats['unknown']:>9}{stats['duplicates']:>9}")
+    unknown_ids = sorted({object_id for stats in results for object_id in stats.get("unknown_ids", ())})
+    print(f"\n{len(results) - len(failed)}/{len(results)} files processed in {seconds:.2f}s "
+          f"({len(results) / max(seconds, 1e-9):.1f} files/s)")
+    print(f"Parts: {sum(s['parts_in'] for s in results)} in, {sum(s['parts_out'] for s in results)} out, "
+          f"{sum(s['duplicates'] for s in results)} duplicates removed, {sum(s['parse_errors'] for s in results)} unparsable lines")
+    if unknown_ids:
+        print(f"Unknown object IDs (not in objects.OBJECT_NAME): {', '.join(map(str, unknown_ids))}")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transform and validate a directory of contraption files without opening the editor.")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir", help="May be the same as input_dir to edit files in place")
+    parser.add_argument("--pattern", default="*", help="Only process file names matching this glob")
+    parser.add_argument("--rotate", type=int, default=0, help="Quarter turns clockwise")
+    parser.add_argument("--mirror", action="store_true", help="Flip horizontally, like Shift+T")
+    parser.add_argument("--translate", type=int, nargs=2, default=(0, 0), metavar=("DX", "DY"))
+    parser.add_argument("--drop-unknown", action="store_true", help="Remove parts whose object ID is not known")
+    parser.add_argument("--dedupe", action="store_true", help="Keep only the topmost part per cell and layer")
+    parser.add_argument("--allow-errors", action="store_true", help="Write files with unparsable lines anyway, dropping those lines")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    options = {"rotate": args.rotate, "mirror": args.mirror, "translate": tuple(args.translate),
+               "drop_unknown": args.drop_unknown, "dedupe": args.dedupe,
+               "allow_errors": args.allow_errors}
+    files = find_files(args.input_dir, args.pattern)
+    if not files:
+        print(f"No files matching {args.pattern!r} in {args.input_dir}")
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(process_file, os.path.join(args.input_dir, name), os.path.join(args.output_dir, name), options)
+                   for name in files]
+        for future in as_completed(futures):
+            results.append(future.result())
+    results.sort(key=lambda stats: stats["file"])
+    return 0 if print_summary(results, time.perf_counter() - started) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
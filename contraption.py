@@ -0,0 +1,337 @@
+import os
+import re
+import struct
+import sys
+import tempfile
+import time
+import warnings
+from itertools import compress
+import numpy as np
+
+# Game text format, one part per line: object_id,skin,x,-y,rotation,mirror,0,0
+FRAME_IDS = [5, 6]  # Frames go on layer 0, everything else on layer 1
+
+# Binary format (.bpc), for archives and big files: a header, then one little-endian column
+# per field (object_id, skin, grid_x, grid_y, rotation, mirror), each 8-byte aligned and
+# stored in the smallest integer type that holds all its values. grid_y is in editor
+# orientation. Reading memory-maps the file, so there is no per-line parsing. Like the
+# editor, it keeps only the first six text fields; the trailing two are always written as 0.
+BINARY_EXTENSION = '.bpc'
+BINARY_MAGIC = b'BPC\x00'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sIQ6s2x')  # magic, version, part count, column type codes
+
+
+class PartColumns:
+    # Parsed parts as parallel NumPy columns, in file order, with grid_y already un-negated
+    def __init__(self, object_ids, skins, xs, ys, rotations, mirrors, errors=None, line_count=0, seconds=0.0,
+                 extra_lines=0, odd_mirrors=0):
+        self.object_ids = object_ids
+        self.skins = skins
+        self.xs = xs
+        self.ys = ys
+        self.rotations = rotations
+        self.mirrors = mirrors
+        self.layers = np.where(np.isin(object_ids, FRAME_IDS), 0, 1)
+        self.errors = errors or []  # (line_number, message)
+        self.line_count = line_count
+        self.seconds = seconds
+        self.extra_lines = extra_lines  # Lines with non-zero fields after the sixth, which are not kept
+        self.odd_mirrors = odd_mirrors  # Parts whose mirror field was neither 0 nor 1 (read as mirrored)
+
+    def __len__(self):
+        return len(self.object_ids)
+
+    def rows(self):
+        # (grid_x, grid_y, object_id, layer, rotation, mirror, skin) tuples in Part argument order
+        return zip(self.xs.tolist(), self.ys.tolist(), self.object_ids.tolist(), self.layers.tolist(),
+                   self.rotations.tolist(), self.mirrors.tolist(), self.skins.tolist())
+
+    def throughput(self):
+        return len(self) / self.seconds if self.seconds > 0 else float('inf')
+
+
+def empty_columns():
+    empty = np.zeros(0, dtype=np.int64)
+    return PartColumns(empty, empty, empty, empty, empty, np.zeros(0, dtype=bool))
+
+
+def _columns_from_table(table, errors, line_count, started, extra_lines=0):
+    odd_mirrors = int(np.count_nonzero((table[:, 5] != 0) & (table[:, 5] != 1)))
+    return PartColumns(table[:, 0], table[:, 1], table[:, 2], -table[:, 3], table[:, 4], table[:, 5] != 0,
+                       errors, line_count, time.perf_counter() - started, extra_lines, odd_mirrors)
+
+
+def _parse_uniform(text):
+    # Fast path for well-formed files: every line holds the same number (>= 6) of integer
+    # fields. Returns the (n, fields) table, or None so the caller falls back to line by line.
+    text = text.replace('\r', '').strip()
+    if not text or '\n\n' in text or not text.isascii():
+        return None
+    data = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+    line_ends = np.append(np.flatnonzero(data == ord('\n')), len(data) - 1)
+    commas_per_line = np.diff(np.searchsorted(np.flatnonzero(data == ord(',')), line_ends), prepend=0)
+    field_count = int(commas_per_line[0]) + 1
+    if field_count < 6 or not np.all(commas_per_line == field_count - 1):
+        return None
+    try:
+        with warnings.catch_warnings():
+            # Depending on the NumPy version a malformed value either raises or warns and stops early
+            warnings.simplefilter('ignore', DeprecationWarning)
+            values = np.fromstring(text.replace('\n', ','), dtype=np.int64, sep=',')
+    except ValueError:
+        return None
+    if values.size != len(line_ends) * field_count:
+        return None
+    return values.reshape(-1, field_count)
+
+
+def _has_extras(rest):
+    # rest: the text after the sixth comma
+    for value in rest.split(','):
+        try:
+            if int(value) != 0:
+                return True
+        except ValueError:
+            return True
+    return False
+
+
+# The first six fields of a line as integers, then anything (the trailing fields)
+_ROW = re.compile(r'((?:\s*[-+]?[0-9]+\s*,){5}\s*[-+]?[0-9]+\s*)(?:,(.*))?')
+_FIELD_BYTES = np.zeros(256, dtype=bool)  # Bytes a line of integer fields can hold
+_FIELD_BYTES[list(b'0123456789,-+ \t\n')] = True
+
+
+def _split_good_lines(text):
+    # Vectorized triage of a file the fast path refused: blank lines are skipped, lines with
+    # fewer than six fields or a byte no integer field has are recorded as errors. Returns
+    # (text of the remaining lines, errors, line count), or None when the bad lines can't be
+    # told apart this way (non-ASCII text, other line separators, junk in trailing fields).
+    text = text.replace('\r\n', '\n')
+    if not text.isascii():
+        return None
+    data = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+    if np.isin(data, list(b'\r\x0b\x0c\x1c\x1d\x1e')).any():
+        return None  # str.splitlines would number the lines differently
+    lines = text.split('\n')
+    if lines[-1] == '':
+        lines.pop()  # Like splitlines: a final newline ends the last line, it doesn't start one
+    count = len(lines)
+    newlines = np.flatnonzero(data == ord('\n'))
+    starts = np.append(0, newlines + 1)[:count]
+    ends = np.append(newlines, len(data))[:count]
+
+    def per_line(positions):
+        # How many of the (sorted) byte positions fall in each line
+        return np.searchsorted(positions, ends) - np.searchsorted(positions, starts)
+    foreign = per_line(np.flatnonzero(~_FIELD_BYTES[data]))
+    commas = per_line(np.flatnonzero(data == ord(',')))
+    content = ends - starts - per_line(np.flatnonzero((data == ord(' ')) | (data == ord('\t'))))
+    bad = (content > 0) & ((foreign > 0) | (commas < 5))
+    errors = []
+    for number in np.flatnonzero(bad).tolist():
+        line = lines[number].strip()
+        if _ROW.fullmatch(line):
+            return None  # Integers in the first six fields, junk after them: not an error
+        row = line.split(',', 6)
+        if len(row) < 6:
+            errors.append((number + 1, f"expected at least 6 fields, got {len(row)}"))
+        else:
+            errors.append((number + 1, f"non-integer field in {','.join(row[:6])!r}"))
+    good = '\n'.join(compress(lines, ((content > 0) & ~bad).tolist()))
+    return good, errors, count
+
+
+def parse_text(text):
+    started = time.perf_counter()
+    table = _parse_uniform(text)
+    if table is not None:
+        extra_lines = int(np.count_nonzero(np.any(table[:, 6:] != 0, axis=1)))
+        return _columns_from_table(table[:, :6], [], len(table), started, extra_lines)
+    # Usually only a few lines are blank or malformed: drop those and take the fast path after all
+    split = _split_good_lines(text)
+    if split is not None:
+        good, errors, line_count = split
+        table = _parse_uniform(good)
+        if table is not None:
+            extra_lines = int(np.count_nonzero(np.any(table[:, 6:] != 0, axis=1)))
+            return _columns_from_table(table[:, :6], errors, line_count, started, extra_lines)
+        if not good:
+            columns = empty_columns()
+            columns.errors = errors
+            columns.line_count = line_count
+            columns.seconds = time.perf_counter() - started
+            return columns
+    # Lines of several widths or odd formatting: check each line, cut the good ones down to
+    # their six fields and parse those with the fast path
+    lines = text.splitlines()
+    good = []
+    extra_lines = 0
+    errors = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        match = _ROW.fullmatch(line)
+        if match:
+            good.append(match.group(1))
+            rest = match.group(2)
+            if rest is not None and rest != '0,0' and _has_extras(rest):
+                extra_lines += 1
+            continue
+        row = line.split(',', 6)
+        if len(row) < 6:
+            errors.append((number, f"expected at least 6 fields, got {len(row)}"))
+        else:
+            errors.append((number, f"non-integer field in {','.join(row[:6])!r}"))
+    if not good:
+        columns = empty_columns()
+        columns.errors = errors
+        columns.line_count = len(lines)
+        columns.seconds = time.perf_counter() - started
+        return columns
+    table = _parse_uniform('\n'.join(good))
+    if table is None:
+        # Values the fast path refuses (e.g. spaces around them): convert line by line
+        table = np.array([[int(value) for value in row.split(',')] for row in good], dtype=np.int64)
+    return _columns_from_table(table, errors, len(lines), started, extra_lines)
+
+
+def read_file(filepath):
+    # Either format, recognized by its first bytes rather than the file name
+    with open(filepath, 'rb') as f:
+        magic = f.read(len(BINARY_MAGIC))
+    if magic == BINARY_MAGIC:
+        return read_binary(filepath)
+    with open(filepath, 'r') as f:
+        return parse_text(f.read())
+
+
+def _aligned(size):
+    return (size + 7) // 8 * 8
+
+
+def read_binary(filepath):
+    # Raises ValueError for a file that is not a complete binary contraption
+    started = time.perf_counter()
+    data = np.memmap(filepath, dtype=np.uint8, mode='r')
+    if len(data) < BINARY_HEADER.size:
+        raise ValueError(f"{filepath}: truncated header")
+    magic, version, count, codes = BINARY_HEADER.unpack(bytes(data[:BINARY_HEADER.size]))
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"{filepath}: not a version {BINARY_VERSION} binary contraption")
+    offset = BINARY_HEADER.size
+    columns = []
+    for code in codes.decode('ascii'):
+        dtype = np.dtype('<' + code)
+        if offset + count * dtype.itemsize > len(data):
+            raise ValueError(f"{filepath}: truncated data")
+        # Widen the mapped column with one vectorized copy; no line is ever parsed
+        columns.append(np.frombuffer(data, dtype=dtype, count=count, offset=offset).astype(np.int64))
+        offset += _aligned(count * dtype.itemsize)
+    del data  # Drop the mapping so the file can be replaced (Windows keeps mapped files locked)
+    object_ids, skins, xs, ys, rotations, mirrors = columns
+    return PartColumns(object_ids, skins, xs, ys, rotations, mirrors != 0, line_count=count,
+                       seconds=time.perf_counter() - started, odd_mirrors=int(np.count_nonzero(mirrors > 1)))
+
+
+def _smallest_int_code(column):
+    for code in 'bhiq':
+        info = np.iinfo(code)
+        if not len(column) or (column.min() >= info.min and column.max() <= info.max):
+            return code
+    return 'q'
+
+
+def report_errors(filepath, columns):
+    for number, message in columns.errors:
+        print(f"{filepath}:{number}: skipped malformed line ({message})")
+
+
+def format_rows(rows):
+    # rows: (object_id, skin, grid_x, grid_y, rotation, mirror) with grid_y in editor orientation
+    return ''.join(f"{object_id},{skin},{grid_x},{-grid_y},{rotation},{int(mirror)},0,0\n"
+                   for object_id, skin, grid_x, grid_y, rotation, mirror in rows)
+
+
+def write_file(filepath, rows, progress=None):
+    # Binary for .bpc files, the game's text format for everything else
+    if filepath.lower().endswith(BINARY_EXTENSION):
+        write_binary(filepath, rows, progress)
+    else:
+        write_rows(filepath, rows, progress)
+
+
+def write_rows(filepath, rows, progress=None, batch_size=10000):
+    def write(f):
+        for start in range(0, len(rows), batch_size):
+            f.write(format_rows(rows[start:start + batch_size]))
+            if progress:
+                progress(min(start + batch_size, len(rows)))
+    _write_atomic(filepath, 'w', write)
+
+
+def write_binary(filepath, rows, progress=None):
+    table = np.array(rows, dtype=np.int64).reshape(-1, 6)
+    table[:, 5] = table[:, 5] != 0
+    codes = ''.join(_smallest_int_code(table[:, i]) for i in range(5)) + 'B'
+
+    def write(f):
+        f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(table), codes.encode('ascii')))
+        for i, code in enumerate(codes):
+            column = table[:, i].astype('<' + code).tobytes()
+            f.write(column + b'\0' * (_aligned(len(column)) - len(column)))
+        if progress:
+            progress(len(table))
+    _write_atomic(filepath, 'wb', write)
+
+
+def _write_atomic(filepath, file_mode, write):
+    # Write to a temp file in the same directory and rename it over the target, so a crash
+    # or a concurrent reader never sees a half-written contraption
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, temp_path = tempfile.mkstemp(prefix='.bpedit-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, file_mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file as 0600; keep the permissions a plain open() would give
+        mode = os.stat(filepath).st_mode & 0o777 if os.path.exists(filepath) else 0o644
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, filepath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def convert(source, target):
+    # Exact conversion in either direction; the output format follows the target's extension.
+    # Returns False without writing if the source holds anything the conversion would lose.
+    columns = read_file(source)
+    report_errors(source, columns)
+    problems = []
+    if columns.errors:
+        problems.append(f"{len(columns.errors)} malformed line(s) would be dropped")
+    if columns.extra_lines:
+        problems.append(f"{columns.extra_lines} line(s) have non-zero fields after the sixth, which would be written back as 0,0")
+    if columns.odd_mirrors:
+        problems.append(f"{columns.odd_mirrors} part(s) have a mirror value other than 0 or 1, which would be written back as 1")
+    if problems:
+        print(f"Not converted: in {source}, " + '; '.join(problems))
+        return False
+    rows = list(zip(columns.object_ids.tolist(), columns.skins.tolist(), columns.xs.tolist(),
+                    columns.ys.tolist(), columns.rotations.tolist(), columns.mirrors.tolist()))
+    write_file(target, rows)
+    print(f"Converted {len(rows)} parts: {source} -> {target}")
+    return True
+
+
+# Usage: python contraption.py SOURCE TARGET   (TARGET ending in .bpc = binary, otherwise text)
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python contraption.py SOURCE TARGET")
+        sys.exit(2)
+    sys.exit(0 if convert(sys.argv[1], sys.argv[2]) else 1)
@@ -0,0 +1,61 @@
+from collections import deque
+import numpy as np
+
+# Undo/redo history. An edit is stored as the rows it removed and the rows it added
+# (object_id, skin, grid_x, grid_y, rotation, mirror), packed into one int64 array per
+# side, so a 10k-part paste is a single ~480 KB step instead of 10k Python tuples.
+
+
+def pack_rows(rows):
+    # rows: part_row tuples, or an (n, 6) table already gathered from columns
+    if isinstance(rows, np.ndarray):
+        return rows.astype(np.int64, copy=False).reshape(-1, 6)
+    return np.array(rows, dtype=np.int64).reshape(-1, 6)
+
+
+def unpack_rows(packed):
+    return [(object_id, skin, grid_x, grid_y, rotation, bool(mirror))
+            for object_id, skin, grid_x, grid_y, rotation, mirror in packed.tolist()]
+
+
+class History:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.undo_stack = deque()  # (removed, added) packed arrays, oldest first
+        self.redo_stack = []
+        self.size_bytes = 0
+
+    def push(self, removed, added):
+        delta = (pack_rows(removed), pack_rows(added))
+        self.undo_stack.append(delta)
+        self.size_bytes += self.delta_bytes(delta)
+        # A new edit forks history: the redo branch is gone
+        for old in self.redo_stack:
+            self.size_bytes -= self.delta_bytes(old)
+        self.redo_stack.clear()
+        # Forget the oldest steps once over budget, but always keep the newest one
+        while self.size_bytes > self.max_bytes and len(self.undo_stack) > 1:
+            self.size_bytes -= self.delta_bytes(self.undo_stack.popleft())
+
+    def undo(self):
+        # Returns (removed, added) rows to apply to revert the last edit, or None
+        if not self.undo_stack:
+            return None
+        removed, added = self.undo_stack.pop()
+        self.redo_stack.append((removed, added))
+        return unpack_rows(added), unpack_rows(removed)
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        removed, added = self.redo_stack.pop()
+        self.undo_stack.append((removed, added))
+        return unpack_rows(removed), unpack_rows(added)
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.size_bytes = 0
+
+    def delta_bytes(self, delta):
+        return delta[0].nbytes + delta[1].nbytes
@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+import pygame
+import contraption
+
+# Persistent index of a contraption directory for the library panel: part count, bounding
+# box, object-ID histogram and a small thumbnail per file. An entry is rebuilt only when
+# its file's mtime or size changes, so reopening the library re-reads just the new files.
+INDEX_NAME = 'index.json'
+INDEX_VERSION = 1
+THUMBNAIL_DIRECTORY = 'thumbnails'
+THUMBNAIL_BACKGROUND = (0, 7, 104)  # Editor background
+SAVE_INTERVAL = 5.0  # Seconds between index writes while indexing
+
+
+def load_index(directory):
+    path = os.path.join(directory, INDEX_NAME)
+    try:
+        with open(path, 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {'version': INDEX_VERSION, 'files': {}}
+    if index.get('version') != INDEX_VERSION or not isinstance(index.get('files'), dict):
+        return {'version': INDEX_VERSION, 'files': {}}
+    return index
+
+
+def save_index(directory, index):
+    # Temp file + rename: a crash while writing leaves the previous index intact
+    path = os.path.join(directory, INDEX_NAME)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(index, f, sort_keys=True)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print(f"Could not write library index {path}: {e}")
+
+
+def summarize(columns):
+    if not len(columns):
+        return {'parts': 0, 'bounds': None, 'histogram': {}}
+    object_ids, counts = np.unique(columns.object_ids, return_counts=True)
+    return {'parts': len(columns),
+            'bounds': [int(columns.xs.min()), int(columns.ys.min()), int(columns.xs.max()), int(columns.ys.max())],
+            'histogram': {str(object_id): count for object_id, count in zip(object_ids.tolist(), counts.tolist())}}
+
+
+def render_thumbnail(columns, colors, size):
+    # One flat-colored pixel per cell (frames under everything else), scaled up for small builds
+    surface = pygame.Surface((size, size))
+    surface.fill(THUMBNAIL_BACKGROUND)
+    if not len(columns):
+        return surface
+    min_x, min_y, max_x, max_y = int(columns.xs.min()), int(columns.ys.min()), int(columns.xs.max()), int(columns.ys.max())
+    span = max(max_x - min_x, max_y - min_y) + 1
+    resolution = min(span, size)
+    palette = np.full((max(colors, default=0) + 1, 3), 128, dtype=np.uint8)  # Unknown objects are gray
+    for object_id, color in colors.items():
+        palette[object_id] = color[:3]
+    object_ids = columns.object_ids
+    object_ids = np.where((object_ids >= 0) & (object_ids < len(palette)), object_ids, 0)
+    order = np.argsort(columns.layers, kind='stable')
+    pixels = np.empty((resolution, resolution, 3), dtype=np.uint8)
+    pixels[:] = THUMBNAIL_BACKGROUND
+    pixels[(columns.xs[order] - min_x) * resolution // span, (columns.ys[order] - min_y) * resolution // span] = palette[object_ids[order]]
+    scale = size // resolution
+    raster = pygame.transform.scale(pygame.surfarray.make_surface(pixels), (resolution * scale, resolution * scale))
+    width = (max_x - min_x + 1) * resolution // span * scale
+    height = (max_y - min_y + 1) * resolution // span * scale
+    surface.blit(raster, ((size - width) // 2, (size - height) // 2))
+    return surface
+
+
+class LibraryIndex:
+    # Indexes source_directory on a worker thread; the UI reads entries() at any time
+    def __init__(self, source_directory, index_directory, colors, thumbnail_size=48):
+        self.source_directory = source_directory
+        self.index_directory = index_directory
+        self.colors = colors  # object_id -> (r, g, b) used for thumbnails
+        self.thumbnail_size = thumbnail_size
+        self.index = load_index(index_directory)
+        self.lock = threading.Lock()
+        self.version = 0  # Bumped on every change, so the panel knows when to rebuild
+        self.pending = 0  # Files still to be (re)indexed by the current refresh
+        self.thread = None
+
+    def refresh(self):
+        if self.busy():
+            return
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def busy(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def entries(self):
+        with self.lock:
+            return list(self.index['files'].items())
+
+    def thumbnail_path(self, name):
+        return os.path.join(self.index_directory, THUMBNAIL_DIRECTORY, name + '.png')
+
+    def run(self):
+        try:
+            names = os.listdir(self.source_directory)
+        except OSError as e:
+            print(f"Could not list {self.source_directory}: {e}")
+            return
+        stats = {}
+        for name in names:
+            path = os.path.join(self.source_directory, name)
+            if os.path.isfile(path):
+                stats[name] = os.stat(path)
+        files = self.index['files']
+        with self.lock:
+            for name in [name for name in files if name not in stats]:
+                del files[name]
+                try:
+                    os.remove(self.thumbnail_path(name))
+                except OSError:
+                    pass
+            self.version += 1
+        stale = [name for name, stat in stats.items()
+                 if name not in files or files[name]['mtime'] != stat.st_mtime or files[name]['size'] != stat.st_size]
+        self.pending = len(stale)
+        os.makedirs(os.path.join(self.index_directory, THUMBNAIL_DIRECTORY), exist_ok=True)
+        last_save = time.monotonic()
+        for name in sorted(stale, key=lambda name: -stats[name].st_mtime):  # Newest first
+            entry = {'mtime': stats[name].st_mtime, 'size': stats[name].st_size}
+            try:
+                columns = contraption.read_file(os.path.join(self.source_directory, name))
+                entry.update(summarize(columns))
+                pygame.image.save(render_thumbnail(columns, self.colors, self.thumbnail_size), self.thumbnail_path(name))
+            except (OSError, UnicodeDecodeError, ValueError, pygame.error) as e:
+                entry['error'] = str(e)  # Recorded so an unreadable file isn't retried until it changes
+            with self.lock:
+                files[name] = entry
+                self.version += 1
+            self.pending -= 1
+            if time.monotonic() - last_save >= SAVE_INTERVAL:
+                with self.lock:
+                    save_index(self.index_directory, self.index)
+                last_save = time.monotonic()
+        with self.lock:
+            save_index(self.index_directory, self.index)
+
+
+def matches(name, entry, words, object_names):
+    # Every word must appear in the file name or in the name of an object the file contains;
+    # "#12" means "contains object 12"
+    histogram = entry.get('histogram', {})
+    for word in words:
+        if word.startswith('#') and word[1:].isdigit():
+            if word[1:] not in histogram:
+                return False
+        elif word not in name.lower() and not any(word in object_names.get(int(object_id), '').lower() for object_id in histogram):
+            return False
+    return True
+
+
+SORT_KEYS = {
+    'name': (lambda item: item[0].lower(), False),
+    'modified': (lambda item: item[1]['mtime'], True),
+    'parts': (lambda item: item[1].get('parts', 0), True),
+    'size': (lambda item: 0 if not item[1].get('bounds') else
+             (item[1]['bounds'][2] - item[1]['bounds'][0] + 1) * (item[1]['bounds'][3] - item[1]['bounds'][1] + 1), True),
+}
+
+
+def filter_and_sort(entries, text, sort, object_names):
+    words = text.lower().split()
+    key, reverse = SORT_KEYS[sort]
+    return sorted((item for item in entries if matches(item[0], item[1], words, object_names)), key=key, reverse=reverse)
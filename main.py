@@ -1,9 +1,22 @@
+import time
+IMPORTS_STARTED = time.perf_counter()
 from objects import OBJECT_NAME
+import transforms
+import contraption
+from autosave import Autosave
+from history import History
+from library import LibraryIndex
+import library
+import texture_manifest
+import numpy as np
 import pygame, sys, os
-from tkinter import filedialog, Tk
 import configparser
 import os
+import threading
+from itertools import islice, repeat
+from collections import OrderedDict
 
+CONFIG_STARTED = time.perf_counter()
 config = configparser.ConfigParser(interpolation=None)
 config.read('config.ini')
 
@@ -20,8 +33,49 @@ SKIN_PANEL_HEIGHT = config.getint('UI', 'skin_panel_height')
 SKIN_PANEL_OFFSET_X = config.getint('UI', 'skin_panel_offset_x')
 SCREEN_WIDTH = config.getint('Screen', 'screen_width')
 SCREEN_HEIGHT = config.getint('Screen', 'screen_height')
+TEXTURE_CACHE_SIZE = config.getint('Performance', 'texture_cache_size', fallback=512)
+CHUNK_SIZE = config.getint('Performance', 'chunk_size', fallback=16)
+MAX_CHUNK_SURFACE = config.getint('Performance', 'max_chunk_surface', fallback=1024)
+CHUNK_CACHE_MEGAPIXELS = config.getint('Performance', 'chunk_cache_megapixels', fallback=32)
+FRAME_MODE = config.get('Performance', 'frame_mode', fallback='fixed')  # fixed: always 60 FPS, idle: wait for events
+IDLE_TIMEOUT_MS = config.getint('Performance', 'idle_timeout_ms', fallback=500)
+LOAD_BATCH_SIZE = config.getint('Performance', 'load_batch_size', fallback=5000)
+GRID_MIN_SPACING = config.getint('Performance', 'grid_min_spacing', fallback=8)  # Grid lines closer than this are thinned out
+LOD_FLAT_SIZE = config.getint('Performance', 'lod_flat_size', fallback=6)  # Below this cell size parts are flat colored cells
+UNDO_MEMORY_MB = config.getint('Undo', 'max_memory_mb', fallback=64)
+AUTOSAVE_ENABLED = config.getboolean('Autosave', 'enabled', fallback=True)
+AUTOSAVE_DIRECTORY = os.path.join(SAVEFILE_DIRECTORY, config.get('Autosave', 'directory_name', fallback='BP-Edit autosave'))
+AUTOSAVE_FLUSH_INTERVAL = config.getfloat('Autosave', 'flush_interval', fallback=2.0)
+AUTOSAVE_SNAPSHOT_INTERVAL = config.getfloat('Autosave', 'snapshot_interval', fallback=60.0)
+STAMP_SPACING = config.getint('Stamp', 'spacing', fallback=0)
+STAMP_MAX_PARTS = config.getint('Stamp', 'max_parts', fallback=200000)
+IMPORT_CONFLICTS = config.get('Import', 'conflicts', fallback='move')  # move: find free space nearby, skip: drop overlapping parts
+IMPORT_SEARCH_RADIUS = config.getint('Import', 'search_radius', fallback=32)  # In chunks around the cursor
+LIBRARY_DIRECTORY = os.path.join(SAVEFILE_DIRECTORY, config.get('Library', 'directory_name', fallback='BP-Edit library'))
+LIBRARY_THUMBNAIL_SIZE = config.getint('Library', 'thumbnail_size', fallback=48)
+CONFIG_PARSED = time.perf_counter()
+
+class StartupTimer:
+    # Per-phase startup timings for --profile-startup
+    def __init__(self):
+        self.phases = [("imports", CONFIG_STARTED - IMPORTS_STARTED), ("config parse", CONFIG_PARSED - CONFIG_STARTED)]
+        self.last = time.perf_counter()
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def report(self):
+        print("Startup profile:")
+        for name, seconds in self.phases:
+            print(f"  {name:<24}{seconds * 1000:9.1f} ms")
+        print(f"  {'total':<24}{sum(seconds for _, seconds in self.phases) * 1000:9.1f} ms")
 
 class Part:
+    # Slots instead of a per-instance __dict__: large contraptions hold hundreds of thousands of parts
+    __slots__ = ('grid_x', 'grid_y', 'object_id', 'layer', 'rotation', 'mirror', 'skin')
+
     def __init__(self, grid_x, grid_y, object_id, layer=0, rotation=0, mirror=False, skin=0):
         self.grid_x = grid_x
         self.grid_y = grid_y
@@ -31,14 +85,195 @@ class Part:
         self.mirror = mirror
         self.skin = skin
 
+class TextureCache:
+    # LRU cache of part textures already scaled, mirrored and rotated for drawing
+    def __init__(self, max_size=TEXTURE_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.mipmaps = {}  # (object_id, skin) -> [full size, 1/2, 1/4, ...] copies of the texture
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, texture, object_id, skin, size, mirror, angle):
+        key = (object_id, skin, size, mirror, angle)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        # Shrink from the smallest mipmap level that is still at least as large as the target
+        source = texture
+        for level in self.get_mipmaps(texture, object_id, skin):
+            if level.get_width() < size:
+                break
+            source = level
+        surface = pygame.transform.smoothscale(source, (size, size))
+        if mirror:
+            surface = pygame.transform.flip(surface, True, False)
+        surface = pygame.transform.rotate(surface, angle)
+        self.entries[key] = surface
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def get_mipmaps(self, texture, object_id, skin):
+        levels = self.mipmaps.get((object_id, skin))
+        if levels is None:
+            levels = [texture]
+            while levels[-1].get_width() >= 16:
+                level = levels[-1]
+                levels.append(pygame.transform.smoothscale(level, (level.get_width() // 2, level.get_height() // 2)))
+            self.mipmaps[(object_id, skin)] = levels
+        return levels
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+class Selection:
+    # Insertion-ordered set of selected parts with a cached bounding box
+    def __init__(self, parts=()):
+        self.parts = dict.fromkeys(parts)
+        self.bounds = None  # (min_x, min_y, max_x, max_y), None when it must be recomputed
+
+    def __contains__(self, part):
+        return part in self.parts
+
+    def __iter__(self):
+        return iter(self.parts)
+
+    def __len__(self):
+        return len(self.parts)
+
+    def add(self, part):
+        if part in self.parts:
+            return
+        self.parts[part] = None
+        if self.bounds is not None:
+            min_x, min_y, max_x, max_y = self.bounds
+            self.bounds = (min(min_x, part.grid_x), min(min_y, part.grid_y), max(max_x, part.grid_x), max(max_y, part.grid_y))
+
+    def discard(self, part):
+        if part in self.parts:
+            del self.parts[part]
+            self.bounds = None
+
+    def get_bounds(self):
+        if self.bounds is None and self.parts:
+            parts = iter(self.parts)
+            first = next(parts)
+            min_x = max_x = first.grid_x
+            min_y = max_y = first.grid_y
+            for part in parts:
+                if part.grid_x < min_x:
+                    min_x = part.grid_x
+                elif part.grid_x > max_x:
+                    max_x = part.grid_x
+                if part.grid_y < min_y:
+                    min_y = part.grid_y
+                elif part.grid_y > max_y:
+                    max_y = part.grid_y
+            self.bounds = (min_x, min_y, max_x, max_y)
+        return self.bounds
+
+    def set_bounds(self, bounds):
+        # For transforms that know the resulting box without rescanning the parts
+        self.bounds = bounds
+
+    def invalidate_bounds(self):
+        self.bounds = None
+
+class LoadJob:
+    # Reads and parses a contraption file on a worker thread; App then feeds the parsed
+    # parts to the grid in batches so the event loop keeps running
+    def __init__(self, filepath, replace, anchor=None):
+        self.filepath = filepath
+        self.replace = replace  # True for Ctrl+O (clear the grid first), False for Ctrl+I
+        self.anchor = anchor  # Import only: grid cell for the top-left corner of the imported parts
+        self.offset = (0, 0)  # Import only: shift applied to every part, see Grid.import_offset
+        self.taken = set()  # Import only: (layer, grid_x, grid_y) already filled by this import
+        self.skipped = 0
+        self.columns = None
+        self.error = None
+        self.rows = None
+        self.loaded_parts = []
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            self.columns = contraption.read_file(self.filepath)
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            self.error = e
+
+    def parsed(self):
+        return not self.thread.is_alive()
+
+    def next_batch(self, size):
+        if self.rows is None:
+            self.rows = self.columns.rows()
+        dx, dy = self.offset
+        return [Part(grid_x + dx, grid_y + dy, *rest) for grid_x, grid_y, *rest in islice(self.rows, size)]
+
+    def progress(self):
+        if not self.parsed() or self.columns is None:
+            return None
+        return len(self.loaded_parts) / max(len(self.columns), 1)
+
+    def label(self):
+        name = os.path.basename(self.filepath)
+        if self.progress() is None:
+            return f"Reading {name}..."
+        return f"Loading {name}: {len(self.loaded_parts)}/{len(self.columns)} parts"
+
+class SaveJob:
+    # Writes a snapshot of the grid on a worker thread, atomically (temp file + rename)
+    def __init__(self, filepath, rows, edit_count):
+        self.filepath = filepath
+        self.rows = rows
+        self.edit_count = edit_count  # Grid.edit_count when rows were taken
+        self.written = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            contraption.write_file(self.filepath, self.rows, progress=self.set_written)
+        except OSError as e:
+            self.error = e
+
+    def set_written(self, count):
+        self.written = count
+
+    def finished(self):
+        return not self.thread.is_alive()
+
+    def progress(self):
+        return self.written / max(len(self.rows), 1)
+
+    def label(self):
+        return f"Saving {os.path.basename(self.filepath)}: {self.written}/{len(self.rows)} parts"
+
 class App():
-    def __init__(self):
+    def __init__(self, profile_startup=False):
+        timer = StartupTimer() if profile_startup else None
         pygame.init()
+        if timer:
+            timer.mark("pygame init")
         self.screen = pygame.display.set_mode((SCREEN_WIDTH,SCREEN_HEIGHT))
         pygame.display.set_caption("BP-Edit")
         self.clock = pygame.time.Clock()
+        if timer:
+            timer.mark("display")
 
-        self.grid = Grid()
+        self.grid = Grid(timer)
         self.selected_part_id = 1
         
         
@@ -57,14 +292,72 @@ class App():
         self.skin_panel_y = self.skin_button_y - SKIN_PANEL_HEIGHT  # Above the button
 
         self.show_help = False
-        self.font = pygame.font.SysFont(None, 24)
+        self._font = None  # Created on first draw
+        self._filedialog = None  # Tk is only started when a file dialog is first needed
+        self.ui_cache = {}  # name -> (state the surface was built for, surface)
+        self.load_job = None
+        self.save_job = None
+
+        self.library = None  # Created the first time the library panel is opened
+        self.library_visible = False
+        self.library_filter = ""
+        self.library_sort = 0  # Index into library.SORT_KEYS
+        self.library_scroll = 0
+        self.library_selected = 0
+        self.library_rows = (None, [])  # (state it was computed for, filtered and sorted entries)
+        self.library_thumbnails = {}  # name -> (mtime, surface)
+        self.library_x = 10
+        self.library_y = 40
+        self.library_width = 460
+        self.library_height = self.hotbar_y - 50
+        self.library_row_height = LIBRARY_THUMBNAIL_SIZE + 8
+
+        self.autosave = None
+        if AUTOSAVE_ENABLED:
+            self.autosave = Autosave(AUTOSAVE_DIRECTORY, AUTOSAVE_FLUSH_INTERVAL, AUTOSAVE_SNAPSHOT_INTERVAL)
+            if self.autosave.has_recovery():
+                replayed = self.autosave.recover(self.grid)
+                print(f"Recovered unsaved work from {AUTOSAVE_DIRECTORY} ({replayed} journaled edits)")
+            self.grid.edit_listeners.append(self.autosave.record)
+
+        if timer:
+            timer.mark("autosave/recovery")
+            # Deferred work is forced here only to show what it costs on this machine
+            self.font
+            timer.mark("font (deferred)")
+            self.filedialog
+            timer.mark("Tk (deferred)")
+            timer.report()
+
+    @property
+    def font(self):
+        if self._font is None:
+            # Default font directly: SysFont(None) resolves to the same font but scans system fonts first
+            self._font = pygame.font.Font(None, 24)
+        return self._font
 
-        self.tk = Tk(useTk=False)
+    @property
+    def filedialog(self):
+        if self._filedialog is None:
+            from tkinter import filedialog, Tk
+            self.tk = Tk(useTk=False)
+            self._filedialog = filedialog
+        return self._filedialog
 
     def run(self):
         self.running = True
+        self.needs_redraw = True
         while self.running:
-            for event in pygame.event.get():
+            events = pygame.event.get()
+            busy = self.grid.is_animating() or self.load_job or self.save_job or self.library_indexing()
+            if FRAME_MODE == 'idle' and not events and not self.needs_redraw and not busy:
+                # Nothing moves on screen: sleep until the next event instead of ticking
+                event = pygame.event.wait(IDLE_TIMEOUT_MS)
+                if event.type != pygame.NOEVENT:
+                    events = [event] + pygame.event.get()
+            if events:
+                self.needs_redraw = True
+            for event in self.coalesce_motion(events):
                 if event.type == pygame.QUIT:
                     self.running = False
                 elif event.type == pygame.KEYDOWN:
@@ -74,8 +367,12 @@ class App():
                         self.save_savefile()
                     elif event.key == pygame.K_i and (event.mod & pygame.KMOD_CTRL):
                         self.load_parts_from_file()
+                    elif event.key == pygame.K_l and (event.mod & pygame.KMOD_CTRL):
+                        self.toggle_library()
                     elif event.key == pygame.K_F1:
                         self.show_help = not self.show_help
+                    elif self.library_visible and self.handle_library_key(event):
+                        pass
                     else:
                         self.grid.handle_event(event, self.selected_part_id, self.selected_skin)
                 elif event.type == pygame.KEYUP:
@@ -88,6 +385,8 @@ class App():
                     elif self.skin_panel_visible and self.is_skin_panel_click(mouse_x, mouse_y):
                         if event.button == 1:
                             self.handle_skin_panel_click(mouse_x, mouse_y)
+                    elif self.library_visible and self.is_library_click(mouse_x, mouse_y):
+                        self.handle_library_click(event)
                     elif self.is_hotbar_click(mouse_x, mouse_y):
                         if event.button == 1:
                             self.handle_hotbar_click(mouse_x, mouse_y)
@@ -96,13 +395,37 @@ class App():
                 elif event.type == pygame.MOUSEMOTION:
                     self.grid.handle_event(event, self.selected_part_id)
                 elif event.type == pygame.MOUSEBUTTONUP:
-                    self.grid.handle_event(event, self.selected_part_id)
+                    self.grid.handle_event(event, self.selected_part_id, self.selected_skin)
 
             self.grid.update()
+            self.update_jobs()
+            if self.autosave:
+                self.autosave.tick(self.grid)
 
-            self.draw()
+            if FRAME_MODE != 'idle' or self.needs_redraw or self.grid.is_animating() or self.load_job or self.save_job or self.library_indexing():
+                self.draw()
+                self.needs_redraw = False
             self.clock.tick(60)
 
+        self.finish_jobs()
+        if self.autosave:
+            # Keep unsaved work for the next start; otherwise there is nothing to recover
+            if self.grid.dirty:
+                self.autosave.snapshot(self.grid)
+            else:
+                self.autosave.discard()
+            self.autosave.close()
+
+    def coalesce_motion(self, events):
+        # Keep only the last MOUSEMOTION of each run of consecutive motion events
+        coalesced = []
+        for event in events:
+            if event.type == pygame.MOUSEMOTION and coalesced and coalesced[-1].type == pygame.MOUSEMOTION:
+                coalesced[-1] = event
+            else:
+                coalesced.append(event)
+        return coalesced
+
     def is_hotbar_click(self, mouse_x, mouse_y):
         return (HOTBAR_OFFSET_X <= mouse_x <= HOTBAR_OFFSET_X + self.hotbar_cols * HOTBAR_SLOT_SIZE and
                 self.hotbar_y <= mouse_y <= self.hotbar_y + HOTBAR_ROWS * HOTBAR_SLOT_SIZE)
@@ -130,51 +453,290 @@ class App():
         # Draw skin panel if visible
         self.draw_skin_panel()
 
+        # Draw library panel if visible
+        self.draw_library()
+
         # Draw help screen if enabled
         if self.show_help:
             self.draw_help()
 
-        self.screen.blit(self.font.render("Press F1 to show controls", True, (255, 255, 255)), (200, 0))
+        # Draw load/save progress
+        self.draw_progress()
+
+        hint = self.get_ui_surface("hint", (self.grid.stamp_mode, self.grid.stamp_spacing, bool(self.grid.copied_parts)),
+                                   self.build_hint)
+        self.screen.blit(hint, (200, 0))
         pygame.display.flip()
 
+    def build_hint(self):
+        if self.grid.stamp_mode:
+            text = f"Stamp: drag to fill with the {'clipboard' if self.grid.copied_parts else 'selected part'}, spacing {self.grid.stamp_spacing} ([ / ]), B to exit"
+        else:
+            text = "Press F1 to show controls"
+        return self.font.render(text, True, (255, 255, 255))
+
+    def get_ui_surface(self, name, state, build):
+        # Rebuild a cached UI surface only when the state it depends on changes
+        cached = self.ui_cache.get(name)
+        if cached is None or cached[0] != state:
+            cached = (state, build())
+            self.ui_cache[name] = cached
+        return cached[1]
+
     def draw_hotbar(self):
+        surface = self.get_ui_surface("hotbar", self.selected_part_id, self.build_hotbar)
+        self.screen.blit(surface, (HOTBAR_OFFSET_X, self.hotbar_y))
+
+    def build_hotbar(self):
+        surface = pygame.Surface((self.hotbar_cols * HOTBAR_SLOT_SIZE, HOTBAR_ROWS * HOTBAR_SLOT_SIZE), pygame.SRCALPHA)
         for i, part_id in enumerate(self.grid.textures.keys()):
             obj_id = part_id[0]  # part_id is (obj_id, 0)
             row = i // self.hotbar_cols
             col = i % self.hotbar_cols
-            x = HOTBAR_OFFSET_X + col * HOTBAR_SLOT_SIZE
-            y = self.hotbar_y + row * HOTBAR_SLOT_SIZE
+            x = col * HOTBAR_SLOT_SIZE
+            y = row * HOTBAR_SLOT_SIZE
             # Draw slot background
             color = (150, 150, 150) if obj_id == self.selected_part_id else (100, 100, 100)
-            pygame.draw.rect(self.screen, color, (x, y, HOTBAR_SLOT_SIZE, HOTBAR_SLOT_SIZE))
-            pygame.draw.rect(self.screen, (200, 200, 200), (x, y, HOTBAR_SLOT_SIZE, HOTBAR_SLOT_SIZE), 2)
+            pygame.draw.rect(surface, color, (x, y, HOTBAR_SLOT_SIZE, HOTBAR_SLOT_SIZE))
+            pygame.draw.rect(surface, (200, 200, 200), (x, y, HOTBAR_SLOT_SIZE, HOTBAR_SLOT_SIZE), 2)
             # Draw texture with default skin
             texture_key = (obj_id, 0)
             texture = self.grid.textures[texture_key]
             scaled_texture = pygame.transform.scale(texture, (HOTBAR_SLOT_SIZE - 4, HOTBAR_SLOT_SIZE - 4))
-            self.screen.blit(scaled_texture, (x + 2, y + 2))
+            surface.blit(scaled_texture, (x + 2, y + 2))
+        return surface
 
     def load_savefile(self):
-        file_path = filedialog.askopenfilename(initialdir=SAVEFILE_DIRECTORY)
+        if self.load_job:
+            return  # One load at a time
+        file_path = self.filedialog.askopenfilename(initialdir=SAVEFILE_DIRECTORY)
         if file_path:
-            self.grid.load(file_path)
+            self.load_job = LoadJob(file_path, replace=True)
 
     def load_parts_from_file(self):
-        file_path = filedialog.askopenfilename(initialdir=SAVEFILE_DIRECTORY)
+        if self.load_job:
+            return
+        anchor = self.grid.screen_to_grid(*pygame.mouse.get_pos())  # Taken before the dialog moves the mouse
+        file_path = self.filedialog.askopenfilename(initialdir=SAVEFILE_DIRECTORY)
         if file_path:
-            loaded_parts = self.grid.load_parts_from_file(file_path)
-            if loaded_parts:
-                # Select the loaded parts
-                self.grid.selected_parts = loaded_parts
-                # Center the view on the loaded parts
-                self.grid.center_on_parts(loaded_parts)
+            self.load_job = LoadJob(file_path, replace=False, anchor=anchor)
 
     def save_savefile(self):
-        file_path = filedialog.asksaveasfilename(initialdir=SAVEFILE_DIRECTORY)
+        if self.save_job:
+            return  # One save at a time
+        if self.load_job:
+            # The grid only holds the batches added so far; saving it could truncate the source file
+            print(f"Still loading {os.path.basename(self.load_job.filepath)}; save again once it has finished")
+            return
+        file_path = self.filedialog.asksaveasfilename(initialdir=SAVEFILE_DIRECTORY)
         if file_path:
-            self.grid.save(file_path)
+            # Snapshot on this thread so edits made while writing don't leak into the file.
+            # The grid stays dirty until the file is actually on disk.
+            self.save_job = SaveJob(file_path, self.grid.snapshot_rows(), self.grid.edit_count)
+
+    def finish_jobs(self):
+        # On exit: the worker threads are daemons and would be killed mid-write, so wait for a
+        # running save (and let a load finish) before deciding what autosave keeps
+        if self.save_job:
+            print(f"Waiting for {os.path.basename(self.save_job.filepath)} to be saved...")
+        while self.load_job or self.save_job:
+            for job in (self.load_job, self.save_job):
+                if job:
+                    job.thread.join()
+            self.update_jobs()
+
+    def update_jobs(self):
+        job = self.load_job
+        if job and job.parsed():
+            if job.error:
+                print(f"Failed to load {job.filepath}: {job.error}")
+                self.load_job = None
+            else:
+                if job.rows is None and job.replace:
+                    self.grid.clear()
+                elif job.rows is None:
+                    job.offset = self.grid.import_offset(job.columns, job.anchor)
+                batch = job.next_batch(LOAD_BATCH_SIZE)
+                if not job.replace:
+                    # Parts landing on an occupied cell are dropped, not stacked
+                    free = self.grid.free_parts(batch, job.taken)
+                    job.skipped += len(batch) - len(free)
+                    batch = free
+                self.grid.add_parts(batch)
+                job.loaded_parts.extend(batch)
+                if len(job.loaded_parts) + job.skipped >= len(job.columns):
+                    self.grid.report_load(job.filepath, job.columns, job.started)
+                    if not job.replace:
+                        self.grid.report_import(job.offset, len(job.loaded_parts), job.skipped)
+                    if job.replace:
+                        self.grid.dirty = False
+                        if self.autosave:
+                            # The journal is relative to the snapshot, so rebase it on the loaded file
+                            self.autosave.snapshot(self.grid)
+                    else:
+                        self.grid.commit_edit([], [self.grid.part_row(part) for part in job.loaded_parts])
+                    if not job.replace and job.loaded_parts:
+                        # Select the loaded parts
+                        self.grid.selected_parts = Selection(job.loaded_parts)
+                        # Center the view on the loaded parts
+                        self.grid.center_on_parts(job.loaded_parts)
+                    self.load_job = None
+        job = self.save_job
+        if job and job.finished():
+            if job.error:
+                print(f"Failed to save {job.filepath}: {job.error}")
+            elif self.grid.edit_count == job.edit_count:
+                self.grid.dirty = False  # Nothing was edited while writing
+            self.save_job = None
+
+    def toggle_library(self):
+        self.library_visible = not self.library_visible
+        if not self.library_visible:
+            return
+        if self.library is None:
+            colors = {obj_id: self.grid.get_object_color(obj_id) for obj_id, _ in self.grid.textures}
+            self.library = LibraryIndex(SAVEFILE_DIRECTORY, LIBRARY_DIRECTORY, colors, LIBRARY_THUMBNAIL_SIZE)
+        # Only files whose mtime or size changed since the last refresh are read again
+        self.library.refresh()
+
+    def library_indexing(self):
+        return self.library_visible and self.library.busy()
+
+    def get_library_rows(self):
+        sort = list(library.SORT_KEYS)[self.library_sort]
+        state = (self.library.version, self.library_filter, sort)
+        if self.library_rows[0] != state:
+            self.library_rows = (state, library.filter_and_sort(self.library.entries(), self.library_filter, sort, OBJECT_NAME))
+        return self.library_rows[1]
+
+    def library_visible_rows(self):
+        return (self.library_height - 40) // self.library_row_height
+
+    def open_library_entry(self, index, replace):
+        rows = self.get_library_rows()
+        if self.load_job or not 0 <= index < len(rows):
+            return
+        # The cursor is over the panel, so imports go to the middle of the screen
+        anchor = None if replace else self.grid.screen_to_grid(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+        self.load_job = LoadJob(os.path.join(SAVEFILE_DIRECTORY, rows[index][0]), replace, anchor)
+        self.library_visible = False
+
+    def select_library_row(self, index):
+        rows = self.get_library_rows()
+        self.library_selected = max(0, min(index, len(rows) - 1))
+        # Keep the selected row on screen
+        visible = self.library_visible_rows()
+        self.library_scroll = min(self.library_scroll, self.library_selected)
+        self.library_scroll = max(self.library_scroll, self.library_selected - visible + 1)
+
+    def handle_library_key(self, event):
+        # Returns True if the panel used the key
+        if event.key == pygame.K_ESCAPE:
+            self.library_visible = False
+        elif event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
+            self.open_library_entry(self.library_selected, replace=not event.mod & pygame.KMOD_SHIFT)
+        elif event.key == pygame.K_TAB:
+            self.library_sort = (self.library_sort + 1) % len(library.SORT_KEYS)
+            self.select_library_row(0)
+        elif event.key == pygame.K_UP:
+            self.select_library_row(self.library_selected - 1)
+        elif event.key == pygame.K_DOWN:
+            self.select_library_row(self.library_selected + 1)
+        elif event.key == pygame.K_BACKSPACE:
+            self.library_filter = self.library_filter[:-1]
+            self.select_library_row(0)
+        elif event.unicode and event.unicode.isprintable() and not event.mod & pygame.KMOD_CTRL:
+            self.library_filter += event.unicode
+            self.select_library_row(0)
+        else:
+            return False
+        return True
+
+    def is_library_click(self, mouse_x, mouse_y):
+        return (self.library_x <= mouse_x <= self.library_x + self.library_width and
+                self.library_y <= mouse_y <= self.library_y + self.library_height)
+
+    def handle_library_click(self, event):
+        rows = self.get_library_rows()
+        if event.button == 4:  # Wheel up
+            self.library_scroll = max(0, self.library_scroll - 3)
+        elif event.button == 5:
+            self.library_scroll = max(0, min(self.library_scroll + 3, len(rows) - self.library_visible_rows()))
+        elif event.button == 1:
+            row = (event.pos[1] - self.library_y - 40) // self.library_row_height
+            if event.pos[1] >= self.library_y + 40 and row < self.library_visible_rows():
+                self.library_selected = self.library_scroll + row
+                self.open_library_entry(self.library_selected, replace=not pygame.key.get_mods() & pygame.KMOD_SHIFT)
+
+    def draw_library(self):
+        if not self.library_visible:
+            return
+        state = (self.library.version, self.library.pending, self.library_filter, self.library_sort,
+                 self.library_scroll, self.library_selected)
+        self.screen.blit(self.get_ui_surface("library", state, self.build_library), (self.library_x, self.library_y))
+
+    def get_library_thumbnail(self, name, entry):
+        cached = self.library_thumbnails.get(name)
+        if cached is None or cached[0] != entry['mtime']:
+            try:
+                surface = pygame.image.load(self.library.thumbnail_path(name))
+            except (pygame.error, FileNotFoundError):
+                surface = None
+            cached = (entry['mtime'], surface)
+            self.library_thumbnails[name] = cached
+        return cached[1]
+
+    def build_library(self):
+        surface = pygame.Surface((self.library_width, self.library_height), pygame.SRCALPHA)
+        pygame.draw.rect(surface, (50, 50, 50), (0, 0, self.library_width, self.library_height))
+        pygame.draw.rect(surface, (255, 255, 255), (0, 0, self.library_width, self.library_height), 2)
+        rows = self.get_library_rows()
+        sort = list(library.SORT_KEYS)[self.library_sort]
+        status = f"{len(rows)} files, sort: {sort}"
+        if self.library.busy():
+            status += f", indexing {self.library.pending}"
+        surface.blit(self.font.render(f"Filter: {self.library_filter}_", True, (255, 255, 255)), (10, 6))
+        surface.blit(self.font.render(status, True, (180, 180, 180)), (10, 22))
+        y = 40
+        for index in range(self.library_scroll, min(len(rows), self.library_scroll + self.library_visible_rows())):
+            name, entry = rows[index]
+            if index == self.library_selected:
+                pygame.draw.rect(surface, (90, 90, 90), (2, y, self.library_width - 4, self.library_row_height))
+            thumbnail = self.get_library_thumbnail(name, entry)
+            if thumbnail:
+                surface.blit(thumbnail, (6, y + 4))
+            if 'error' in entry:
+                details = f"unreadable: {entry['error']}"
+            elif entry.get('bounds'):
+                min_x, min_y, max_x, max_y = entry['bounds']
+                details = f"{entry['parts']} parts, {max_x - min_x + 1}x{max_y - min_y + 1}, {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['mtime']))}"
+            else:
+                details = "empty"
+            text_x = LIBRARY_THUMBNAIL_SIZE + 14
+            surface.blit(self.font.render(name, True, (255, 255, 255)), (text_x, y + 6))
+            surface.blit(self.font.render(details, True, (180, 180, 180)), (text_x, y + 26))
+            y += self.library_row_height
+        return surface
+
+    def draw_progress(self):
+        y = 30
+        for job in (self.load_job, self.save_job):
+            if not job:
+                continue
+            bar_width = 400
+            x = (self.screen.get_width() - bar_width) // 2
+            progress = job.progress()
+            pygame.draw.rect(self.screen, (50, 50, 50), (x, y, bar_width, 24))
+            if progress is not None:
+                pygame.draw.rect(self.screen, (90, 160, 90), (x, y, int(bar_width * progress), 24))
+            pygame.draw.rect(self.screen, (255, 255, 255), (x, y, bar_width, 24), 2)
+            self.screen.blit(self.font.render(job.label(), True, (255, 255, 255)), (x + 6, y + 4))
+            y += 30
 
     def draw_help(self):
+        self.screen.blit(self.get_ui_surface("help", None, self.build_help), (10, 10))
+
+    def build_help(self):
         help_lines = [
             "Controls:",
             "WASD - Move camera",
@@ -189,22 +751,35 @@ class App():
             "Del - Delete selected building",
             "Ctrl+C - Copy selected parts",
             "Ctrl+V - Paste copied parts",
+            "B - Stamp tool: drag to tile clipboard / part, [ ] - spacing",
+            "Ctrl+Z - Undo",
+            "Ctrl+Y / Ctrl+Shift+Z - Redo",
             "Ctrl+O - Load file",
             "Ctrl+S - Save file",
             "Ctrl+I - Load parts from file",
+            "Ctrl+L - Contraption library (type to filter, Tab to sort)",
             "F1 - Toggle help"
         ]
-        y = 10
-        for line in help_lines:
-            text_surface = self.font.render(line, True, (255, 255, 255))
-            self.screen.blit(text_surface, (10, y))
+        text_surfaces = [self.font.render(line, True, (255, 255, 255)) for line in help_lines]
+        width = max(text_surface.get_width() for text_surface in text_surfaces)
+        surface = pygame.Surface((width, 30 * len(help_lines)), pygame.SRCALPHA)
+        y = 0
+        for text_surface in text_surfaces:
+            surface.blit(text_surface, (0, y))
             y += 30
+        return surface
 
     def draw_skin_button(self):
         # Draw skin button in bottom right
+        state = (self.selected_part_id, self.selected_skin, self.skin_panel_visible)
+        surface = self.get_ui_surface("skin_button", state, self.build_skin_button)
+        self.screen.blit(surface, (self.skin_button_x, self.skin_button_y))
+
+    def build_skin_button(self):
+        surface = pygame.Surface((self.skin_button_size, self.skin_button_size), pygame.SRCALPHA)
         color = (200, 200, 200) if self.skin_panel_visible else (150, 150, 150)
-        pygame.draw.rect(self.screen, color, (self.skin_button_x, self.skin_button_y, self.skin_button_size, self.skin_button_size))
-        pygame.draw.rect(self.screen, (255, 255, 255), (self.skin_button_x, self.skin_button_y, self.skin_button_size, self.skin_button_size), 2)
+        pygame.draw.rect(surface, color, (0, 0, self.skin_button_size, self.skin_button_size))
+        pygame.draw.rect(surface, (255, 255, 255), (0, 0, self.skin_button_size, self.skin_button_size), 2)
         # Draw current selected part with skin
         texture_key = (self.selected_part_id, self.selected_skin)
         if texture_key in self.grid.textures:
@@ -212,28 +787,35 @@ class App():
         else:
             texture = self.grid.textures[(self.selected_part_id, 0)]  # fallback
         scaled_texture = pygame.transform.scale(texture, (self.skin_button_size - 4, self.skin_button_size - 4))
-        self.screen.blit(scaled_texture, (self.skin_button_x + 2, self.skin_button_y + 2))
+        surface.blit(scaled_texture, (2, 2))
+        return surface
 
     def draw_skin_panel(self):
         if not self.skin_panel_visible:
             return
+        surface = self.get_ui_surface("skin_panel", (self.selected_part_id, self.selected_skin), self.build_skin_panel)
+        self.screen.blit(surface, (self.skin_panel_x, self.skin_panel_y))
+
+    def build_skin_panel(self):
+        surface = pygame.Surface((SKIN_PANEL_WIDTH, SKIN_PANEL_HEIGHT), pygame.SRCALPHA)
         # Draw panel background
-        pygame.draw.rect(self.screen, (50, 50, 50), (self.skin_panel_x, self.skin_panel_y, SKIN_PANEL_WIDTH, SKIN_PANEL_HEIGHT))
-        pygame.draw.rect(self.screen, (255, 255, 255), (self.skin_panel_x, self.skin_panel_y, SKIN_PANEL_WIDTH, SKIN_PANEL_HEIGHT), 2)
+        pygame.draw.rect(surface, (50, 50, 50), (0, 0, SKIN_PANEL_WIDTH, SKIN_PANEL_HEIGHT))
+        pygame.draw.rect(surface, (255, 255, 255), (0, 0, SKIN_PANEL_WIDTH, SKIN_PANEL_HEIGHT), 2)
         # Draw skin options
-        if self.selected_part_id in self.grid.skin_dict:
-            skins = self.grid.skin_dict[self.selected_part_id]
+        skins = self.grid.get_skins(self.selected_part_id)
+        if skins:
             skin_size = 40
             for i, skin_texture in enumerate(skins):
-                x = self.skin_panel_x + 10 + (i % 4) * (skin_size + 5)
-                y = self.skin_panel_y + 10 + (i // 4) * (skin_size + 5)
-                if x + skin_size > self.skin_panel_x + SKIN_PANEL_WIDTH - 10:
+                x = 10 + (i % 4) * (skin_size + 5)
+                y = 10 + (i // 4) * (skin_size + 5)
+                if x + skin_size > SKIN_PANEL_WIDTH - 10:
                     continue  # Skip if out of bounds
                 color = (200, 200, 200) if i == self.selected_skin else (100, 100, 100)
-                pygame.draw.rect(self.screen, color, (x, y, skin_size, skin_size))
-                pygame.draw.rect(self.screen, (255, 255, 255), (x, y, skin_size, skin_size), 1)
+                pygame.draw.rect(surface, color, (x, y, skin_size, skin_size))
+                pygame.draw.rect(surface, (255, 255, 255), (x, y, skin_size, skin_size), 1)
                 scaled_texture = pygame.transform.scale(skin_texture, (skin_size - 4, skin_size - 4))
-                self.screen.blit(scaled_texture, (x + 2, y + 2))
+                surface.blit(scaled_texture, (x + 2, y + 2))
+        return surface
 
     def is_skin_button_click(self, mouse_x, mouse_y):
         return (self.skin_button_x <= mouse_x <= self.skin_button_x + self.skin_button_size and
@@ -244,9 +826,7 @@ class App():
                 self.skin_panel_y <= mouse_y <= self.skin_panel_y + SKIN_PANEL_HEIGHT)
 
     def handle_skin_panel_click(self, mouse_x, mouse_y):
-        if self.selected_part_id not in self.grid.skin_dict:
-            return
-        skins = self.grid.skin_dict[self.selected_part_id]
+        skins = self.grid.get_skins(self.selected_part_id)
         skin_size = 40
         for i, skin_texture in enumerate(skins):
             x = self.skin_panel_x + 10 + (i % 4) * (skin_size + 5)
@@ -257,8 +837,17 @@ class App():
 
 
 class Grid():
-    def __init__(self):
-        self.parts_in_grid = [[], []]  # Initialize as list of lists for layers
+    def __init__(self, timer=None, headless=False):
+        self.parts_in_grid = [{}, {}]  # Per layer: insertion-ordered dict used as a set of parts (draw order)
+        # Per layer: (grid_x, grid_y) -> the Part in that cell, or a list of parts (bottom to top) only
+        # where parts are stacked; a one-element list per cell would cost more than the Part itself
+        self.cell_index = [{}, {}]
+        self.chunk_index = [{}, {}]  # Per layer: (chunk_x, chunk_y) -> dict used as a set of parts
+        self.chunk_surfaces = OrderedDict()  # (layer, chunk_x, chunk_y) -> pre-rendered chunk, LRU order
+        self.chunk_surface_size = None  # Zoomed cell size the cached chunk surfaces were rendered at
+        self.chunk_cache_pixels = 0
+        self.flat_chunks = {}  # (layer, chunk_x, chunk_y) -> one pixel per cell, for low zoom
+        self.grid_background = (None, None)  # ((width, height, line spacing), surface) of pre-drawn grid lines
         self.cell_size = 50  # Size of each cell in pixels
         self.colored_cells = {}  # Dictionary to store colored cells: (grid_x, grid_y) -> color
         self.offset_x = 0
@@ -272,60 +861,112 @@ class Grid():
         self.zooming_out = False
         self.rotating = False
         self.selecting = False
+        self.stamp_mode = False
+        self.stamp_spacing = STAMP_SPACING  # Empty cells between stamped tiles
+        self.stamping = False  # Dragging out a stamp rectangle
         self.selection_start = None
         self.selection_rect = None
-        self.selected_parts = []
+        self.selected_parts = Selection()
         self.dragging = False
         self.drag_offset = None
         self.drag_start_grid = None
+        self.drag_last_grid = None
+        self.drag_parts = None  # The selection as a list fixed at drag start, in drag_initial_* order
         self.drag_initial_positions = None
+        self.drag_initial_rows = None
         self.copied_parts = []
+        self.last_load_stats = None
+        self.dirty = False  # Edited since the last load/save
+        self.edit_count = 0  # Bumped on every edit, so a finished save knows if it is still current
+        self.edit_listeners = []  # Called as listener(removed_rows, added_rows) after every edit; rows may be a column_table
+        self.history = History(UNDO_MEMORY_MB * 1024 * 1024)
+        self.texture_cache = TextureCache()
         self.textures = {}
-        self.skin_textures = {}
+        self.skin_textures = {}  # Filled per object the first time one of its skins is needed
+        self.skin_dict = {}  # {obj_id: [list of skin textures]}, built lazily by get_skins
+        self.skin_atlas_ids = set()
+        self.loaded_skin_ids = set()
+        self.object_colors = {}  # object_id -> average color, see get_object_color
+        if headless:
+            # Load/edit/save only (batch tools): convert_alpha needs a display, so no textures
+            return
+        self.manifest = texture_manifest.load_manifest(TEXTURES_DIRECTORY_PATH)
         # Load main texture atlas
         self.atlas = pygame.image.load(TEXTURES_DIRECTORY_PATH+"parts.png").convert_alpha()
         atlas_width, atlas_height = self.atlas.get_size()
         self.cols = atlas_width // 108
         self.rows = atlas_height // 108
-        # Extract textures from main atlas (skin=0)
-        for i in range(1, 48):
+        # Extract textures from main atlas (skin=0), skipping empty slots
+        for i in self.atlas_slots("parts.png", self.atlas, range(1, 48)):
             col = (i - 1) % self.cols
             row = (i - 1) // self.cols
-            x = col * 108
-            y = row * 108
-            subsurface = self.atlas.subsurface((x, y, 108, 108))
-            # Skip empty surfaces
-            if subsurface.get_bounding_rect().width > 0:
-                self.textures[(i, 0)] = subsurface
-
-        # Load skin atlases if available
-        for obj_id in range(1, 48):
-            skin_path = TEXTURES_DIRECTORY_PATH+str(obj_id)+"_skin.png"
-            if os.path.exists(skin_path):
-                skin_atlas = pygame.image.load(skin_path).convert_alpha()
-                skin_atlas_width, skin_atlas_height = skin_atlas.get_size()
-                skin_cols = skin_atlas_width // 108
-                skin_rows = skin_atlas_height // 108
-                for skin_i in range(1, skin_cols * skin_rows + 1):
-                    col = (skin_i - 1) % skin_cols
-                    row = (skin_i - 1) // skin_cols
-                    x = col * 108
-                    y = row * 108
-                    subsurface = skin_atlas.subsurface((x, y, 108, 108))
-                    # Skip empty surfaces
-                    if subsurface.get_bounding_rect().width > 0:
-                        self.skin_textures[(obj_id, skin_i)] = subsurface
-        print(self.skin_textures)
-
-
-
-        # Create skin dictionary: {obj_id: [list of skin textures]}
-        self.skin_dict = {}
-        for obj_id in range(1, 48):
-            self.skin_dict[obj_id] = [self.textures[(obj_id, 0)]]  # Add default skin first
-        for (obj_id, skin_i), texture in self.skin_textures.items():
-            self.skin_dict[obj_id].append(texture)
-        print(self.skin_dict)
+            self.textures[(i, 0)] = self.atlas.subsurface((col * 108, row * 108, 108, 108))
+        if timer:
+            timer.mark("atlas load")
+
+        # Skin atlases are only located here; they are loaded on first use
+        texture_files = set(os.listdir(TEXTURES_DIRECTORY_PATH or '.'))
+        self.skin_atlas_ids = {obj_id for obj_id in range(1, 48) if f"{obj_id}_skin.png" in texture_files}
+        if timer:
+            timer.mark("skin atlas scan")
+
+    def atlas_slots(self, filename, atlas, candidates):
+        # Non-empty slots among candidates, from the manifest or by probing the atlas once
+        slots = texture_manifest.current_slots(self.manifest, TEXTURES_DIRECTORY_PATH, filename)
+        if slots is None:
+            cols = atlas.get_width() // 108
+            slots = []
+            for i in range(1, cols * (atlas.get_height() // 108) + 1):
+                subsurface = atlas.subsurface(((i - 1) % cols * 108, (i - 1) // cols * 108, 108, 108))
+                if subsurface.get_bounding_rect().width > 0:
+                    slots.append(i)
+            texture_manifest.record_slots(self.manifest, TEXTURES_DIRECTORY_PATH, filename, slots)
+            texture_manifest.save_manifest(TEXTURES_DIRECTORY_PATH, self.manifest)
+        return [i for i in slots if i in candidates]
+
+    def load_skin_atlas(self, obj_id):
+        if obj_id in self.loaded_skin_ids:
+            return
+        self.loaded_skin_ids.add(obj_id)
+        if obj_id not in self.skin_atlas_ids:
+            return
+        filename = str(obj_id)+"_skin.png"
+        skin_atlas = pygame.image.load(TEXTURES_DIRECTORY_PATH+filename).convert_alpha()
+        skin_cols = skin_atlas.get_width() // 108
+        skin_count = skin_cols * (skin_atlas.get_height() // 108)
+        for skin_i in self.atlas_slots(filename, skin_atlas, range(1, skin_count + 1)):
+            col = (skin_i - 1) % skin_cols
+            row = (skin_i - 1) // skin_cols
+            self.skin_textures[(obj_id, skin_i)] = skin_atlas.subsurface((col * 108, row * 108, 108, 108))
+
+    def get_skins(self, obj_id):
+        # Default texture followed by the object's skins; loads the skin atlas if needed
+        if obj_id not in self.skin_dict:
+            if (obj_id, 0) not in self.textures:
+                return []
+            self.load_skin_atlas(obj_id)
+            skins = [self.textures[(obj_id, 0)]]  # Add default skin first
+            skins += [texture for (skin_obj_id, _), texture in sorted(self.skin_textures.items()) if skin_obj_id == obj_id]
+            self.skin_dict[obj_id] = skins
+        return self.skin_dict[obj_id]
+
+    def get_skin_texture(self, texture_key):
+        self.load_skin_atlas(texture_key[0])
+        return self.skin_textures.get(texture_key)
+
+    def get_object_color(self, object_id):
+        # Alpha-weighted average color of the object's default texture
+        color = self.object_colors.get(object_id)
+        if color is None:
+            texture = self.textures.get((object_id, 0))
+            if texture is None:
+                color = (128, 128, 128)
+            else:
+                rgb = pygame.surfarray.array3d(texture).reshape(-1, 3).astype(np.int64)
+                alpha = pygame.surfarray.array_alpha(texture).reshape(-1, 1).astype(np.int64)
+                color = tuple(int(c) for c in (rgb * alpha).sum(axis=0) // max(int(alpha.sum()), 1))
+            self.object_colors[object_id] = color
+        return color
 
     def get_rotation_angle(self, object_id, rotation):
         if object_id in [39, 45]:
@@ -339,16 +980,10 @@ class Grid():
     def draw(self, screen):
         width, height = screen.get_size()
         cell_size_zoomed = int(self.cell_size * self.zoom)
-        # Draw vertical lines
-        start_x = -self.offset_x % cell_size_zoomed
-        for x in range(start_x, width + cell_size_zoomed, cell_size_zoomed):
-            pygame.draw.line(screen, (100, 100, 100), (x, 0), (x, height))
-        # Draw horizontal lines
-        start_y = -self.offset_y % cell_size_zoomed
-        for y in range(start_y, height + cell_size_zoomed, cell_size_zoomed):
-            pygame.draw.line(screen, (100, 100, 100), (0, y), (width, y))
+        # Grid lines: one blit of a cached line pattern, scrolled by the offset
+        background, spacing = self.get_grid_background(width, height, cell_size_zoomed)
+        screen.blit(background, (0, 0), (self.offset_x % spacing, self.offset_y % spacing, width, height))
         # Draw axes
-        width, height = screen.get_size()
         # Vertical axis (x=0)
         axis_x = -self.offset_x
         if 0 <= axis_x <= width:
@@ -363,30 +998,107 @@ class Grid():
             screen_x = grid_x * cell_size_zoomed - self.offset_x
             screen_y = grid_y * cell_size_zoomed - self.offset_y
             pygame.draw.rect(screen, color, (screen_x, screen_y, cell_size_zoomed, cell_size_zoomed))
-        # Draw parts in layer order
+        # Blit pre-rendered chunks unless the zoom is animating or chunks would be too large
+        use_chunks = not (self.zooming_in or self.zooming_out) and (CHUNK_SIZE + 1) * cell_size_zoomed <= MAX_CHUNK_SURFACE
+        min_x, min_y, max_x, max_y = self.draw_parts(screen, cell_size_zoomed, use_chunks)
+        if self.dragging:
+            self.draw_drag_preview(screen, cell_size_zoomed, min_x, min_y, max_x, max_y)
+        # Highlight selected parts: walk the parts on screen, not the selection, which can be a
+        # whole import far larger than the view
+        if self.selected_parts:
+            selected = self.selected_parts.parts
+            for layer in range(len(self.parts_in_grid)):
+                for part in self.parts_in_rect(layer, min_x, min_y, max_x, max_y):
+                    if part in selected:
+                        screen_x = part.grid_x * cell_size_zoomed - self.offset_x
+                        screen_y = part.grid_y * cell_size_zoomed - self.offset_y
+                        pygame.draw.rect(screen, (255, 255, 0), (screen_x, screen_y, cell_size_zoomed, cell_size_zoomed), 3)
+        # Draw selection rectangle
+        if self.selection_rect:
+            pygame.draw.rect(screen, (255, 255, 0), self.selection_rect, 2)
+
+    def draw_drag_preview(self, screen, cell_size_zoomed, min_x, min_y, max_x, max_y):
+        # The dragged parts at their would-be positions, over the grid; nothing is reindexed
+        # or re-rendered until the drop, so a step costs only what is visible
+        dx = self.drag_last_grid[0] - self.drag_start_grid[0]
+        dy = self.drag_last_grid[1] - self.drag_start_grid[1]
+        if not dx and not dy:
+            return
+        xs, ys = transforms.translate(*self.drag_initial_positions, dx, dy)
+        object_ids = self.drag_initial_rows[0]
+        visible = np.flatnonzero((xs >= min_x) & (xs <= max_x) & (ys >= min_y) & (ys <= max_y))
+        # Frames first, like the layer order of draw_parts
+        visible = visible[np.argsort(~np.isin(object_ids[visible], [5, 6]), kind='stable')]
+        if cell_size_zoomed < LOD_FLAT_SIZE:
+            # Same look as draw_flat: one colored pixel per cell, scaled once
+            raster = pygame.Surface((max_x - min_x + 1, max_y - min_y + 1), pygame.SRCALPHA)
+            unique_ids, inverse = np.unique(object_ids[visible], return_inverse=True)
+            palette = np.array([self.get_object_color(object_id)[:3] for object_id in unique_ids.tolist()], dtype=np.uint8).reshape(-1, 3)
+            cells = (xs[visible] - min_x, ys[visible] - min_y)
+            rgb = pygame.surfarray.pixels3d(raster)
+            rgb[cells] = palette[inverse]
+            del rgb
+            alpha = pygame.surfarray.pixels_alpha(raster)
+            alpha[cells] = 255
+            del alpha  # Unlock the surface before scaling
+            raster = pygame.transform.scale(raster, (raster.get_width() * cell_size_zoomed, raster.get_height() * cell_size_zoomed))
+            screen.blit(raster, (min_x * cell_size_zoomed - self.offset_x, min_y * cell_size_zoomed - self.offset_y))
+            return
+        for i, x, y in zip(visible.tolist(), xs[visible].tolist(), ys[visible].tolist()):
+            texture = self.get_part_texture(self.drag_parts[i], cell_size_zoomed)
+            if texture is not None:
+                screen.blit(texture, (x * cell_size_zoomed - self.offset_x, y * cell_size_zoomed - self.offset_y))
+
+    def draw_parts(self, screen, cell_size_zoomed, use_chunks):
+        # Draw parts in layer order, only those inside the visible grid rectangle; returns that rectangle
+        width, height = screen.get_size()
+        min_x, min_y, max_x, max_y = self.visible_grid_rect(width, height)
+        if cell_size_zoomed < LOD_FLAT_SIZE:
+            # Textures would be a few noisy pixels: draw one flat color per cell instead
+            self.draw_flat(screen, cell_size_zoomed, min_x, min_y, max_x, max_y)
+            return min_x, min_y, max_x, max_y
+        if use_chunks and self.chunk_surface_size != cell_size_zoomed:
+            self.chunk_surfaces.clear()
+            self.chunk_cache_pixels = 0
+            self.chunk_surface_size = cell_size_zoomed
+        chunk_pixels = CHUNK_SIZE * cell_size_zoomed
         for layer in range(len(self.parts_in_grid)):
-            for part in self.parts_in_grid[layer]:
-                texture_key = (part.object_id, part.skin)
-                if texture_key in self.textures:
-                    texture = self.textures[texture_key]
-                elif texture_key in self.skin_textures:
-                    texture = self.skin_textures[texture_key]
-                else:
+            if use_chunks:
+                for chunk_x, chunk_y in self.chunks_in_rect(layer, min_x, min_y, max_x, max_y):
+                    surface = self.get_chunk_surface(layer, chunk_x, chunk_y, cell_size_zoomed)
+                    screen.blit(surface, (chunk_x * chunk_pixels - self.offset_x, chunk_y * chunk_pixels - self.offset_y))
+                continue
+            for part in self.parts_in_rect(layer, min_x, min_y, max_x, max_y):
+                texture = self.get_part_texture(part, cell_size_zoomed)
+                if texture is None:
                     continue  # Skip if no texture found
                 screen_x = part.grid_x * cell_size_zoomed - self.offset_x
                 screen_y = part.grid_y * cell_size_zoomed - self.offset_y
-                scaled_texture = pygame.transform.smoothscale(texture, (cell_size_zoomed,cell_size_zoomed))
-                if part.mirror:
-                    scaled_texture = pygame.transform.flip(scaled_texture, True, False)
-                angle = self.get_rotation_angle(part.object_id, part.rotation)
-                rotated_texture = pygame.transform.rotate(scaled_texture, angle)
-                screen.blit(rotated_texture, (screen_x, screen_y))
-                # Highlight selected parts
-                if part in self.selected_parts:
-                    pygame.draw.rect(screen, (255, 255, 0), (screen_x, screen_y, cell_size_zoomed, cell_size_zoomed), 3)
-        # Draw selection rectangle
-        if self.selection_rect:
-            pygame.draw.rect(screen, (255, 255, 0), self.selection_rect, 2)
+                screen.blit(texture, (screen_x, screen_y))
+        return min_x, min_y, max_x, max_y
+
+    def get_grid_background(self, width, height, cell_size_zoomed):
+        # Lines every cell, or every 2nd/4th/... cell when cells get smaller than GRID_MIN_SPACING.
+        # One line period larger than the screen, so any offset is a sub-rectangle of it.
+        spacing = cell_size_zoomed
+        while spacing < GRID_MIN_SPACING:
+            spacing *= 2
+        key, surface = self.grid_background
+        if key != (width, height, spacing):
+            surface = pygame.Surface((width + spacing, height + spacing))
+            # Run-length encoded colorkey instead of per-pixel alpha: the mostly empty surface blits quickly
+            surface.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+            for x in range(0, width + spacing, spacing):
+                pygame.draw.line(surface, (100, 100, 100), (x, 0), (x, height + spacing))
+            for y in range(0, height + spacing, spacing):
+                pygame.draw.line(surface, (100, 100, 100), (0, y), (width + spacing, y))
+            self.grid_background = ((width, height, spacing), surface)
+        return surface, spacing
+
+    def is_animating(self):
+        # True while the view or a selection changes every frame without new events
+        return (self.moving_up or self.moving_down or self.moving_left or self.moving_right or
+                self.zooming_in or self.zooming_out or self.dragging or self.selecting or self.stamping)
 
     def update(self):
         if self.moving_up:
@@ -406,76 +1118,499 @@ class Grid():
             if self.zoom < 0.1:
                 self.zoom = 0.1
 
+    def visible_grid_rect(self, width, height):
+        # Inclusive grid bounds covering the screen, one extra cell up/left for rotated textures
+        cell_size_zoomed = int(self.cell_size * self.zoom)
+        min_x = self.offset_x // cell_size_zoomed - 1
+        min_y = self.offset_y // cell_size_zoomed - 1
+        max_x = (self.offset_x + width) // cell_size_zoomed
+        max_y = (self.offset_y + height) // cell_size_zoomed
+        return min_x, min_y, max_x, max_y
+
+    def chunks_in_rect(self, layer, min_x, min_y, max_x, max_y):
+        chunks = self.chunk_index[layer]
+        min_cx, min_cy = min_x // CHUNK_SIZE, min_y // CHUNK_SIZE
+        max_cx, max_cy = max_x // CHUNK_SIZE, max_y // CHUNK_SIZE
+        if (max_cx - min_cx + 1) * (max_cy - min_cy + 1) <= len(chunks):
+            return [(cx, cy) for cy in range(min_cy, max_cy + 1) for cx in range(min_cx, max_cx + 1) if (cx, cy) in chunks]
+        return [key for key in chunks if min_cx <= key[0] <= max_cx and min_cy <= key[1] <= max_cy]
+
+    def parts_in_rect(self, layer, min_x, min_y, max_x, max_y):
+        chunks = self.chunk_index[layer]
+        for key in self.chunks_in_rect(layer, min_x, min_y, max_x, max_y):
+            for part in chunks[key]:
+                if min_x <= part.grid_x <= max_x and min_y <= part.grid_y <= max_y:
+                    yield part
+
+    def get_part_texture(self, part, cell_size_zoomed):
+        # Scaled, mirrored and rotated texture for a part, or None if it has no texture
+        texture_key = (part.object_id, part.skin)
+        if texture_key in self.textures:
+            texture = self.textures[texture_key]
+        else:
+            texture = self.get_skin_texture(texture_key)
+            if texture is None:
+                return None
+        angle = self.get_rotation_angle(part.object_id, part.rotation)
+        return self.texture_cache.get(texture, part.object_id, part.skin, cell_size_zoomed, part.mirror, angle)
+
+    def draw_flat(self, screen, cell_size_zoomed, min_x, min_y, max_x, max_y):
+        # Compose the visible cells at one pixel each, then scale once to the zoomed cell size
+        chunks = [(layer, chunk_x, chunk_y) for layer in range(len(self.parts_in_grid))
+                  for chunk_x, chunk_y in self.chunks_in_rect(layer, min_x, min_y, max_x, max_y)]
+        if not chunks:
+            return  # Nothing on screen: skip scaling an empty raster
+        raster = pygame.Surface((max_x - min_x + 1, max_y - min_y + 1), pygame.SRCALPHA)
+        for layer, chunk_x, chunk_y in chunks:
+            raster.blit(self.get_flat_chunk(layer, chunk_x, chunk_y), (chunk_x * CHUNK_SIZE - min_x, chunk_y * CHUNK_SIZE - min_y))
+        raster = pygame.transform.scale(raster, (raster.get_width() * cell_size_zoomed, raster.get_height() * cell_size_zoomed))
+        screen.blit(raster, (min_x * cell_size_zoomed - self.offset_x, min_y * cell_size_zoomed - self.offset_y))
+
+    def get_flat_chunk(self, layer, chunk_x, chunk_y):
+        key = (layer, chunk_x, chunk_y)
+        surface = self.flat_chunks.get(key)
+        if surface is None:
+            surface = pygame.Surface((CHUNK_SIZE, CHUNK_SIZE), pygame.SRCALPHA)
+            base_x = chunk_x * CHUNK_SIZE
+            base_y = chunk_y * CHUNK_SIZE
+            for part in self.chunk_index[layer][(chunk_x, chunk_y)]:
+                surface.set_at((part.grid_x - base_x, part.grid_y - base_y), self.get_object_color(part.object_id))
+            self.flat_chunks[key] = surface
+        return surface
+
+    def get_chunk_surface(self, layer, chunk_x, chunk_y, cell_size_zoomed):
+        key = (layer, chunk_x, chunk_y)
+        surface = self.chunk_surfaces.get(key)
+        if surface is not None:
+            self.chunk_surfaces.move_to_end(key)
+            return surface
+        # One spare cell on the right/bottom for 45 degree textures that overhang their cell
+        size = (CHUNK_SIZE + 1) * cell_size_zoomed
+        surface = pygame.Surface((size, size), pygame.SRCALPHA)
+        base_x = chunk_x * CHUNK_SIZE
+        base_y = chunk_y * CHUNK_SIZE
+        for part in self.chunk_index[layer][(chunk_x, chunk_y)]:
+            texture = self.get_part_texture(part, cell_size_zoomed)
+            if texture is not None:
+                surface.blit(texture, ((part.grid_x - base_x) * cell_size_zoomed, (part.grid_y - base_y) * cell_size_zoomed))
+        self.chunk_surfaces[key] = surface
+        self.chunk_cache_pixels += size * size
+        while self.chunk_cache_pixels > CHUNK_CACHE_MEGAPIXELS * 1000000 and len(self.chunk_surfaces) > 1:
+            _, evicted = self.chunk_surfaces.popitem(last=False)
+            self.chunk_cache_pixels -= evicted.get_width() * evicted.get_height()
+        return surface
+
+    def invalidate_chunk(self, layer, chunk_x, chunk_y):
+        self.flat_chunks.pop((layer, chunk_x, chunk_y), None)
+        surface = self.chunk_surfaces.pop((layer, chunk_x, chunk_y), None)
+        if surface is not None:
+            self.chunk_cache_pixels -= surface.get_width() * surface.get_height()
+
+    def invalidate_part(self, part):
+        # Call after changing how a part looks without moving it (rotation, mirror)
+        self.invalidate_chunk(part.layer, part.grid_x // CHUNK_SIZE, part.grid_y // CHUNK_SIZE)
+
     def screen_to_grid(self, screen_x, screen_y):
         cell_size_zoomed = int(self.cell_size * self.zoom)
         grid_x = (screen_x + self.offset_x) // cell_size_zoomed
         grid_y = (screen_y + self.offset_y) // cell_size_zoomed
         return grid_x, grid_y
 
+    def part_columns(self, parts):
+        # Coordinate/orientation columns of the given parts as NumPy arrays, in iteration order
+        count = len(parts)
+        xs = np.fromiter((part.grid_x for part in parts), dtype=np.int64, count=count)
+        ys = np.fromiter((part.grid_y for part in parts), dtype=np.int64, count=count)
+        rotations = np.fromiter((part.rotation for part in parts), dtype=np.int64, count=count)
+        mirrors = np.fromiter((part.mirror for part in parts), dtype=bool, count=count)
+        object_ids = np.fromiter((part.object_id for part in parts), dtype=np.int64, count=count)
+        return xs, ys, rotations, mirrors, object_ids
+
+    def part_at(self, layer, grid_x, grid_y):
+        # Topmost part in the cell on the given layer, or None
+        entry = self.cell_index[layer].get((grid_x, grid_y))
+        return entry[-1] if type(entry) is list else entry
+
+    def cell_parts(self, layer, grid_x, grid_y):
+        # Parts in the cell on the given layer, bottom to top
+        entry = self.cell_index[layer].get((grid_x, grid_y))
+        if entry is None:
+            return ()
+        return entry if type(entry) is list else (entry,)
+
+    def is_occupied(self, layer, grid_x, grid_y):
+        return (grid_x, grid_y) in self.cell_index[layer]
+
+    def stack_part(self, cell_index, cell, part):
+        entry = cell_index.get(cell)
+        if entry is None:
+            cell_index[cell] = part
+        elif type(entry) is list:
+            entry.append(part)
+        else:
+            cell_index[cell] = [entry, part]
+
+    def unstack_part(self, cell_index, cell, part):
+        entry = cell_index.get(cell)
+        if entry is part:
+            del cell_index[cell]
+        elif type(entry) is list and part in entry:
+            entry.remove(part)
+            if len(entry) == 1:
+                cell_index[cell] = entry[0]
+
+    def index_part(self, part):
+        self.stack_part(self.cell_index[part.layer], (part.grid_x, part.grid_y), part)
+        chunk = (part.grid_x // CHUNK_SIZE, part.grid_y // CHUNK_SIZE)
+        self.chunk_index[part.layer].setdefault(chunk, {})[part] = None
+        self.invalidate_chunk(part.layer, *chunk)
+
+    def unindex_part(self, part):
+        self.unstack_part(self.cell_index[part.layer], (part.grid_x, part.grid_y), part)
+        chunk = (part.grid_x // CHUNK_SIZE, part.grid_y // CHUNK_SIZE)
+        chunk_parts = self.chunk_index[part.layer].get(chunk)
+        if chunk_parts is not None:
+            chunk_parts.pop(part, None)
+            if not chunk_parts:
+                del self.chunk_index[part.layer][chunk]
+        self.invalidate_chunk(part.layer, *chunk)
+
+    def add_part(self, part):
+        self.parts_in_grid[part.layer][part] = None
+        self.index_part(part)
+
+    def add_parts(self, parts):
+        # Bulk add_part: same bookkeeping, but each touched chunk is invalidated only once
+        touched_chunks = set()
+        for part in parts:
+            layer = part.layer
+            self.parts_in_grid[layer][part] = None
+            self.stack_part(self.cell_index[layer], (part.grid_x, part.grid_y), part)
+            chunk = (layer, part.grid_x // CHUNK_SIZE, part.grid_y // CHUNK_SIZE)
+            chunk_parts = self.chunk_index[layer].get(chunk[1:])
+            if chunk_parts is None:
+                self.chunk_index[layer][chunk[1:]] = {part: None}
+            else:
+                chunk_parts[part] = None
+            touched_chunks.add(chunk)
+        for chunk in touched_chunks:
+            self.invalidate_chunk(*chunk)
+
+    def remove_part(self, part):
+        if part in self.parts_in_grid[part.layer]:
+            del self.parts_in_grid[part.layer][part]
+            self.unindex_part(part)
+            self.selected_parts.discard(part)
+
+    def reindex_parts(self, parts, old_xs, old_ys, new_xs, new_ys):
+        # Bulk move_part for NumPy position columns: the affected cell buckets and chunk sets
+        # are rebuilt once each instead of per part, and each touched chunk is invalidated once
+        moving = set(parts)
+        parts = np.array(parts + [None], dtype=object)[:-1]  # The None keeps NumPy from unpacking anything
+        layers = np.fromiter((part.layer for part in parts), dtype=np.int64, count=len(parts))
+        touched_chunks = set()
+        for layer in np.unique(layers).tolist():
+            in_layer = layers == layer
+            cell_index = self.cell_index[layer]
+            chunk_index = self.chunk_index[layer]
+            xs, ys = old_xs[in_layer], old_ys[in_layer]
+            cells = list(zip(xs.tolist(), ys.tolist()))
+            entries = list(map(cell_index.pop, cells, repeat(None, len(cells))))
+            # A lone Part in a moving part's cell can only be that part itself
+            single = all(type(entry) is Part for entry in entries)
+            if not single:
+                for cell, entry in zip(cells, entries):
+                    if type(entry) is list:
+                        kept = [part for part in entry if part not in moving]
+                        if kept:
+                            cell_index[cell] = kept if len(kept) > 1 else kept[0]
+            for chunk in set(zip((xs // CHUNK_SIZE).tolist(), (ys // CHUNK_SIZE).tolist())):
+                chunk_parts = chunk_index.pop(chunk, None)
+                if chunk_parts is not None:
+                    kept = {part: None for part in chunk_parts if part not in moving}
+                    if kept:
+                        chunk_index[chunk] = kept
+                touched_chunks.add((layer, *chunk))
+
+            layer_parts = parts[in_layer]
+            xs, ys = new_xs[in_layer], new_ys[in_layer]
+            for part, x, y in zip(layer_parts.tolist(), xs.tolist(), ys.tolist()):
+                part.grid_x = x
+                part.grid_y = y
+            cells = list(zip(xs.tolist(), ys.tolist()))
+            if cell_index.keys().isdisjoint(cells) and len(set(cells)) == len(cells):
+                # Nothing stacks at the new positions: one C-level update
+                cell_index.update(zip(cells, layer_parts.tolist()))
+            else:
+                for part, cell in zip(layer_parts.tolist(), cells):
+                    self.stack_part(cell_index, cell, part)
+            # Group by chunk with a stable sort, so each chunk set is filled in one call
+            chunk_xs, chunk_ys = xs // CHUNK_SIZE, ys // CHUNK_SIZE
+            order = np.lexsort((chunk_ys, chunk_xs))
+            chunk_xs, chunk_ys = chunk_xs[order], chunk_ys[order]
+            starts = np.flatnonzero(np.r_[True, (chunk_xs[1:] != chunk_xs[:-1]) | (chunk_ys[1:] != chunk_ys[:-1])])
+            ends = np.r_[starts[1:], len(order)]
+            sorted_parts = layer_parts[order].tolist()
+            for start, end, chunk_x, chunk_y in zip(starts.tolist(), ends.tolist(), chunk_xs[starts].tolist(), chunk_ys[starts].tolist()):
+                chunk_parts = chunk_index.get((chunk_x, chunk_y))
+                if chunk_parts is None:
+                    chunk_index[(chunk_x, chunk_y)] = dict.fromkeys(sorted_parts[start:end])
+                else:
+                    chunk_parts.update(dict.fromkeys(sorted_parts[start:end]))
+                touched_chunks.add((layer, chunk_x, chunk_y))
+        for chunk in touched_chunks:
+            self.invalidate_chunk(*chunk)
+
+    def move_part(self, part, grid_x, grid_y):
+        self.unindex_part(part)
+        part.grid_x = grid_x
+        part.grid_y = grid_y
+        self.index_part(part)
+
+    def clear(self):
+        self.parts_in_grid = [{}, {}]
+        self.cell_index = [{}, {}]
+        self.chunk_index = [{}, {}]
+        self.chunk_surfaces.clear()
+        self.chunk_cache_pixels = 0
+        self.flat_chunks.clear()
+        self.selected_parts = Selection()
+        self.dragging = False  # A drag in progress refers to parts that are gone
+        self.drag_parts = None
+        self.history.clear()  # Deltas from another contraption no longer apply
+
+    def column_table(self, object_ids, skins, xs, ys, rotations, mirrors):
+        # Gathered columns as an (n, 6) int64 table in part_row order: commit_edit takes it in
+        # place of a list of rows, so large edits never go through per-part tuples
+        return np.column_stack((object_ids, skins, xs, ys, rotations, mirrors)).astype(np.int64, copy=False)
+
+    def part_row(self, part):
+        return (part.object_id, part.skin, part.grid_x, part.grid_y, part.rotation, part.mirror)
+
+    def commit_edit(self, removed, added):
+        # Report one user edit as rows that disappeared and rows that appeared (lists of
+        # part_row tuples or column_table arrays)
+        if not len(removed) and not len(added):
+            return
+        self.history.push(removed, added)
+        self.notify_edit(removed, added)
+
+    def notify_edit(self, removed, added):
+        self.dirty = True
+        self.edit_count += 1
+        for listener in self.edit_listeners:
+            listener(removed, added)
+
+    def undo(self):
+        delta = self.history.undo()
+        if delta:
+            self.apply_history_delta(*delta)
+
+    def redo(self):
+        delta = self.history.redo()
+        if delta:
+            self.apply_history_delta(*delta)
+
+    def apply_history_delta(self, removed, added):
+        restored = self.apply_delta(removed, added)
+        if restored:
+            self.selected_parts = Selection(restored)
+        # Listeners (autosave) still see undo/redo as edits; only the history itself must not
+        self.notify_edit(removed, added)
+
+    def apply_delta(self, removed, added):
+        # Replay an edit recorded as rows: remove matching parts, then add new ones
+        for object_id, skin, grid_x, grid_y, rotation, mirror in removed:
+            layer = 0 if object_id in [5, 6] else 1
+            for part in self.cell_parts(layer, grid_x, grid_y):
+                if (part.object_id, part.skin, part.rotation, part.mirror) == (object_id, skin, rotation, mirror):
+                    self.remove_part(part)
+                    break
+        new_parts = [Part(grid_x, grid_y, object_id, 0 if object_id in [5, 6] else 1, rotation, mirror, skin)
+                     for object_id, skin, grid_x, grid_y, rotation, mirror in added]
+        self.add_parts(new_parts)
+        return new_parts
+
+    def snapshot_rows(self):
+        # Plain tuples of every part, safe to hand to another thread while editing continues
+        return [(part.object_id, part.skin, part.grid_x, part.grid_y, part.rotation, part.mirror)
+                for layer in self.parts_in_grid for part in layer]
+
     def save(self, filepath):
-        with open(filepath, 'w') as f:
-            for layer in self.parts_in_grid:
-                for part in layer:
-                    f.write(f"{part.object_id},{part.skin},{part.grid_x},{-part.grid_y},{part.rotation},{int(part.mirror)},0,0\n")
+        contraption.write_file(filepath, self.snapshot_rows())
 
     def load(self, filepath):
-        self.parts_in_grid = [[], []]  # Initialize as list of lists for layers
-        with open(filepath, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    parts = line.split(',')
-                    if len(parts) >= 6:
-                        object_id = int(parts[0])
-                        skin = int(parts[1])
-                        grid_x = int(parts[2])
-                        grid_y = -int(parts[3])
-                        rotation = int(parts[4])
-                        mirror = bool(int(parts[5]))
-                        layer = 0 if object_id in [5, 6] else 1
-                        new_part = Part(grid_x, grid_y, object_id, layer, rotation, mirror, skin)
-                        if layer < len(self.parts_in_grid):
-                            self.parts_in_grid[layer].append(new_part)
-
-    def load_parts_from_file(self, filepath):
-        loaded_parts = []
-        with open(filepath, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    parts = line.split(',')
-                    if len(parts) >= 6:
-                        object_id = int(parts[0])
-                        skin = int(parts[1])
-                        grid_x = int(parts[2])
-                        grid_y = -int(parts[3])
-                        rotation = int(parts[4])
-                        mirror = bool(int(parts[5]))
-                        layer = 0 if object_id in [5, 6] else 1
-                        new_part = Part(grid_x, grid_y, object_id, layer, rotation, mirror, skin)
-                        # Add to grid without clearing
-                        if layer < len(self.parts_in_grid):
-                            self.parts_in_grid[layer].append(new_part)
-                        loaded_parts.append(new_part)
+        started = time.perf_counter()
+        self.clear()
+        columns = contraption.read_file(filepath)
+        self.add_parts_from_columns(columns)
+        self.report_load(filepath, columns, started)
+
+    def load_parts_from_file(self, filepath, anchor=None):
+        # Add to grid without clearing, away from (or without) parts already there
+        started = time.perf_counter()
+        columns = contraption.read_file(filepath)
+        dx, dy = self.import_offset(columns, anchor)
+        parts = [Part(grid_x + dx, grid_y + dy, *rest) for grid_x, grid_y, *rest in columns.rows()]
+        loaded_parts = self.free_parts(parts, set())
+        self.add_parts(loaded_parts)
+        self.report_load(filepath, columns, started)
+        self.report_import((dx, dy), len(loaded_parts), len(parts) - len(loaded_parts))
         return loaded_parts
 
+    def add_parts_from_columns(self, columns):
+        new_parts = [Part(*row) for row in columns.rows()]
+        self.add_parts(new_parts)
+        return new_parts
+
+    def report_load(self, filepath, columns, started):
+        contraption.report_errors(filepath, columns)
+        seconds = time.perf_counter() - started
+        self.last_load_stats = {"parts": len(columns), "errors": len(columns.errors),
+                                "parse_seconds": columns.seconds, "total_seconds": seconds}
+        print(f"Loaded {len(columns)} parts from {filepath} in {seconds:.3f}s "
+              f"(parse {columns.seconds:.3f}s, {len(columns) / max(seconds, 1e-9):.0f} parts/s)")
+
     def center_on_parts(self, parts):
         if not parts:
             return
-        min_x = min(part.grid_x for part in parts)
-        max_x = max(part.grid_x for part in parts)
-        min_y = min(part.grid_y for part in parts)
-        max_y = max(part.grid_y for part in parts)
+        xs, ys, _, _, _ = self.part_columns(parts)
+        min_x, min_y, max_x, max_y = transforms.bounds_of(xs, ys)
         center_x = (min_x + max_x) / 2
         center_y = (min_y + max_y) / 2
-        screen_width, screen_height = 1600, 900  # Assuming screen size
         cell_size_zoomed = int(self.cell_size * self.zoom)
-        self.offset_x = int(center_x * cell_size_zoomed - screen_width / 2)
-        self.offset_y = int(center_y * cell_size_zoomed - screen_height / 2)
+        self.offset_x = int(center_x * cell_size_zoomed - SCREEN_WIDTH / 2)
+        self.offset_y = int(center_y * cell_size_zoomed - SCREEN_HEIGHT / 2)
 
     def move(self, dx, dy):
         pass
 
+    def select_all(self):
+        self.selected_parts = Selection(part for layer in self.parts_in_grid for part in layer)
+
+    def rotate_selected(self):
+        # Rotate selected building clockwise around its center
+        if not self.selected_parts:
+            return
+        parts = list(self.selected_parts)
+        xs, ys, rotations, mirrors, object_ids = self.part_columns(parts)
+        skins = [part.skin for part in parts]
+        new_xs, new_ys, new_rotations, bounds = transforms.rotate_cw(xs, ys, rotations, object_ids, self.selected_parts.get_bounds())
+        for part, rotation in zip(parts, new_rotations.tolist()):
+            part.rotation = rotation
+        self.reindex_parts(parts, xs, ys, new_xs, new_ys)
+        self.selected_parts.set_bounds(bounds)
+        self.commit_edit(self.column_table(object_ids, skins, xs, ys, rotations, mirrors),
+                         self.column_table(object_ids, skins, new_xs, new_ys, new_rotations, mirrors))
+
+    def flip_selected(self):
+        # Flip selected building horizontally (180 degrees along x)
+        if not self.selected_parts:
+            return
+        parts = list(self.selected_parts)
+        xs, ys, rotations, mirrors, object_ids = self.part_columns(parts)
+        skins = [part.skin for part in parts]
+        new_xs, new_rotations, new_mirrors, bounds = transforms.flip_horizontal(xs, rotations, mirrors, object_ids, self.selected_parts.get_bounds())
+        for part, rotation, mirror in zip(parts, new_rotations.tolist(), new_mirrors.tolist()):
+            part.rotation = rotation
+            part.mirror = mirror
+        self.reindex_parts(parts, xs, ys, new_xs, ys)
+        self.selected_parts.set_bounds(bounds)
+        self.commit_edit(self.column_table(object_ids, skins, xs, ys, rotations, mirrors),
+                         self.column_table(object_ids, skins, new_xs, ys, new_rotations, new_mirrors))
+
+    def translate_selected(self, dx, dy):
+        if not self.selected_parts or (dx == 0 and dy == 0):
+            return
+        parts = list(self.selected_parts)
+        xs, ys, rotations, mirrors, object_ids = self.part_columns(parts)
+        skins = [part.skin for part in parts]
+        new_xs, new_ys = transforms.translate(xs, ys, dx, dy)
+        self.reindex_parts(parts, xs, ys, new_xs, new_ys)
+        self.selected_parts.invalidate_bounds()
+        self.commit_edit(self.column_table(object_ids, skins, xs, ys, rotations, mirrors),
+                         self.column_table(object_ids, skins, new_xs, new_ys, rotations, mirrors))
+
+    def place_parts(self, candidates):
+        # Add (object_id, grid_x, grid_y, rotation, layer, mirror, skin) parts as one batch and one
+        # edit, skipping cells already occupied on the layer, including by an earlier candidate
+        new_parts = self.free_parts([Part(grid_x, grid_y, obj_id, layer, rotation, mirror, skin)
+                                     for obj_id, grid_x, grid_y, rotation, layer, mirror, skin in candidates], set())
+        self.add_parts(new_parts)
+        self.commit_edit([], [self.part_row(part) for part in new_parts])
+        return new_parts
+
+    def free_parts(self, parts, taken):
+        # Parts whose cell is empty on their layer and not in taken (layer, grid_x, grid_y);
+        # their cells are added to taken
+        free = []
+        for part in parts:
+            cell = (part.layer, part.grid_x, part.grid_y)
+            if cell in taken or (part.grid_x, part.grid_y) in self.cell_index[part.layer]:
+                continue
+            taken.add(cell)
+            free.append(part)
+        return free
+
+    def import_offset(self, columns, anchor):
+        # Shift that puts the imported parts' top-left corner on anchor (or leaves them where
+        # they are), moved to the nearest empty area if that spot overlaps existing parts
+        if not len(columns):
+            return (0, 0)
+        dx, dy = (0, 0) if anchor is None else (anchor[0] - int(columns.xs.min()), anchor[1] - int(columns.ys.min()))
+        xs, ys, layers = columns.xs + dx, columns.ys + dy, columns.layers
+        if IMPORT_CONFLICTS != 'move' or not any((x, y) in self.cell_index[layer]
+                                                 for x, y, layer in zip(xs.tolist(), ys.tolist(), layers.tolist())):
+            return (dx, dy)
+        # Chunk-aligned shifts move every part by whole chunks, so the import's set of chunks
+        # just translates; a shift is free if none of those chunks holds a part on that layer
+        footprint = np.unique(np.stack([layers, xs // CHUNK_SIZE, ys // CHUNK_SIZE], axis=1), axis=0).tolist()
+        for radius in range(1, IMPORT_SEARCH_RADIUS + 1):
+            ring = [(kx, ky) for kx in range(-radius, radius + 1) for ky in range(-radius, radius + 1)
+                    if max(abs(kx), abs(ky)) == radius]
+            ring.sort(key=lambda k: k[0] * k[0] + k[1] * k[1])
+            for kx, ky in ring:
+                if not any((cx + kx, cy + ky) in self.chunk_index[layer] for layer, cx, cy in footprint):
+                    return (dx + kx * CHUNK_SIZE, dy + ky * CHUNK_SIZE)
+        return (dx, dy)  # No free area nearby: overlapping parts will be skipped
+
+    def report_import(self, offset, placed, skipped):
+        message = f"Imported {placed} parts shifted by {offset}"
+        if skipped:
+            message += f", skipped {skipped} that overlapped existing or duplicate cells"
+        print(message)
+
+    def stamp(self, min_x, min_y, max_x, max_y, selected_part_id, selected_skin):
+        # Tile the clipboard (or the selected hotbar part) over the inclusive grid rectangle,
+        # stamp_spacing empty cells apart; tiles at the far edges are clipped to the rectangle
+        pattern = self.copied_parts or [(selected_part_id, 0, 0, 0, 0 if selected_part_id in [5, 6] else 1, False, selected_skin)]
+        obj_ids, rel_xs, rel_ys, rotations, layers, mirrors, skins = (np.array(column) for column in zip(*pattern))
+        origin_xs, origin_ys = np.meshgrid(np.arange(min_x, max_x + 1, rel_xs.max() + 1 + self.stamp_spacing),
+                                           np.arange(min_y, max_y + 1, rel_ys.max() + 1 + self.stamp_spacing), indexing='ij')
+        xs = (origin_xs.reshape(-1, 1) + rel_xs).ravel()
+        ys = (origin_ys.reshape(-1, 1) + rel_ys).ravel()
+        index = np.tile(np.arange(len(pattern)), origin_xs.size)
+        inside = (xs <= max_x) & (ys <= max_y)
+        xs, ys, index = xs[inside], ys[inside], index[inside]
+        if len(xs) > STAMP_MAX_PARTS:
+            print(f"Stamp would place {len(xs)} parts, more than [Stamp] max_parts = {STAMP_MAX_PARTS}; skipped")
+            return []
+        return self.place_parts(zip(obj_ids[index].tolist(), xs.tolist(), ys.tolist(), rotations[index].tolist(),
+                                    layers[index].tolist(), mirrors[index].tolist(), skins[index].tolist()))
+
+    def remove_parts(self, parts):
+        removed = [self.part_row(part) for part in parts]
+        for part in parts:
+            self.remove_part(part)
+        self.commit_edit(removed, [])
+
+    def overlapping_parts(self):
+        # Parts hidden under another part in the same cell and layer (all but the topmost)
+        return [part for layer in self.cell_index for entry in layer.values() if type(entry) is list for part in entry[:-1]]
+
+    def unknown_parts(self):
+        return [part for layer in self.parts_in_grid for part in layer if part.object_id not in OBJECT_NAME]
+
     def handle_event(self, event, selected_part_id=1, selected_skin=0):
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_w:
@@ -490,118 +1625,70 @@ class Grid():
                 self.zooming_in = True
             if event.key == pygame.K_DOWN:
                 self.zooming_out = True
-            if event.key == pygame.K_r:
+            # Rotating or mirroring mid-drag would change parts whose drag edit is not committed yet
+            if event.key == pygame.K_r and not self.dragging:
                 if pygame.key.get_mods() & pygame.KMOD_SHIFT:
-                    # Rotate selected building clockwise around its center
-                    if self.selected_parts:
-                        # Calculate center of selected parts
-                        min_x = min(part.grid_x for part in self.selected_parts)
-                        max_x = max(part.grid_x for part in self.selected_parts)
-                        min_y = min(part.grid_y for part in self.selected_parts)
-                        max_y = max(part.grid_y for part in self.selected_parts)
-                        cx = (min_x + max_x) // 2
-                        cy = (min_y + max_y) // 2
-                        # Rotate positions and orientations
-                        for part in self.selected_parts:
-                            # Rotate position 90 degrees clockwise around center
-                            dx = part.grid_x - cx
-                            dy = part.grid_y - cy
-                            new_dx = dy
-                            new_dy = -dx
-                            part.grid_x = round(cx + new_dx)
-                            part.grid_y = round(cy + new_dy)
-                            # Rotate part orientation counterclockwise
-                            if part.object_id in [39, 45]:
-                                part.rotation = (part.rotation + 2) % 8
-                            else:
-                                part.rotation = (part.rotation + 1) % 4
-                        # After rotation, calculate new center and translate to keep it fixed
-                        new_min_x = min(part.grid_x for part in self.selected_parts)
-                        new_max_x = max(part.grid_x for part in self.selected_parts)
-                        new_min_y = min(part.grid_y for part in self.selected_parts)
-                        new_max_y = max(part.grid_y for part in self.selected_parts)
-                        new_cx = (new_min_x + new_max_x) // 2
-                        new_cy = (new_min_y + new_max_y) // 2
-                        # Translate all parts to align new center with initial center
-                        shift_x = round(cx - new_cx)
-                        shift_y = round(cy - new_cy)
-                        for part in self.selected_parts:
-                            part.grid_x += shift_x
-                            part.grid_y += shift_y
+                    self.rotate_selected()
                 else:
                     mouse_x, mouse_y = pygame.mouse.get_pos()
                     grid_x, grid_y = self.screen_to_grid(mouse_x, mouse_y)
                     # Rotate the part at this position
-                    for layer in self.parts_in_grid:
-                        for part in layer:
-                            if part.grid_x == grid_x and part.grid_y == grid_y:
-                                if part.object_id in [39, 45]:
-                                    part.rotation = (part.rotation - 1) % 8
-                                else:
-                                    part.rotation = (part.rotation - 1) % 4
-                                break
-            elif event.key == pygame.K_t: 
+                    for layer in range(len(self.parts_in_grid)):
+                        part = self.part_at(layer, grid_x, grid_y)
+                        if part:
+                            before = self.part_row(part)
+                            if part.object_id in [39, 45]:
+                                part.rotation = (part.rotation - 1) % 8
+                            else:
+                                part.rotation = (part.rotation - 1) % 4
+                            self.invalidate_part(part)
+                            self.commit_edit([before], [self.part_row(part)])
+            elif event.key == pygame.K_t and not self.dragging:
                 if pygame.key.get_mods() & pygame.KMOD_SHIFT:
-                    # Flip selected building horizontally (180 degrees along x)
-                    if self.selected_parts:
-                        # Calculate center of selected parts
-                        min_x = min(part.grid_x for part in self.selected_parts)
-                        max_x = max(part.grid_x for part in self.selected_parts)
-                        cx = (min_x + max_x) // 2
-                    # Flip positions horizontally and adjust orientations
-                    for part in self.selected_parts:
-                        # Reflect over vertical axis through center
-                        part.grid_x = round(2 * cx - part.grid_x)
-                        # Adjust orientation for horizontal flip
-                        if part.object_id in [33, 34, 35, 36]:
-                            # Toggle mirror for mirrorable parts
-                            part.mirror = not part.mirror
-                        if part.object_id in [12,13,14,15,16,17,18,37]:
-                            part.rotation = (4 - part.rotation) % 4 + 2
-                        else:
-                            part.rotation = (4 - part.rotation) % 4 
-                    # After flip, calculate new center and translate to keep it fixed
-                    new_min_x = min(part.grid_x for part in self.selected_parts)
-                    new_max_x = max(part.grid_x for part in self.selected_parts)
-                    new_cx = (new_min_x + new_max_x) // 2
-                    # Translate all parts to align new center with initial center
-                    shift_x = round(cx - new_cx)
-                    for part in self.selected_parts:
-                        part.grid_x += shift_x
+                    self.flip_selected()
                 else:
                     mouse_x, mouse_y = pygame.mouse.get_pos()
                     grid_x, grid_y = self.screen_to_grid(mouse_x, mouse_y)
                     # Mirror the part at this position
-                    for layer in self.parts_in_grid:
-                        for part in layer:
-                            if part.grid_x == grid_x and part.grid_y == grid_y and part.object_id in [33, 34, 35, 36]:
-                                part.mirror = not part.mirror
-                                break
+                    for layer in range(len(self.parts_in_grid)):
+                        part = self.part_at(layer, grid_x, grid_y)
+                        if part and part.object_id in [33, 34, 35, 36]:
+                            before = self.part_row(part)
+                            part.mirror = not part.mirror
+                            self.invalidate_part(part)
+                            self.commit_edit([before], [self.part_row(part)])
             elif event.key == pygame.K_c and pygame.key.get_mods() & pygame.KMOD_CTRL:
                 # Copy selected parts
                 self.copied_parts = []
                 if self.selected_parts:
-                    min_x = min(part.grid_x for part in self.selected_parts)
-                    min_y = min(part.grid_y for part in self.selected_parts)
-                    for part in self.selected_parts:
-                        # Store relative positions
-                        self.copied_parts.append((part.object_id, part.grid_x - min_x, part.grid_y - min_y, part.rotation, part.layer, part.mirror, part.skin))
+                    parts = list(self.selected_parts)
+                    xs, ys, _, _, _ = self.part_columns(parts)
+                    rel_xs, rel_ys = transforms.relative_offsets(xs, ys, self.selected_parts.get_bounds())
+                    # Store relative positions
+                    self.copied_parts = [(part.object_id, rel_x, rel_y, part.rotation, part.layer, part.mirror, part.skin)
+                                         for part, rel_x, rel_y in zip(parts, rel_xs.tolist(), rel_ys.tolist())]
             elif event.key == pygame.K_v and pygame.key.get_mods() & pygame.KMOD_CTRL:
                 # Paste copied parts
                 if self.copied_parts:
                     mouse_x, mouse_y = pygame.mouse.get_pos()
                     base_grid_x, base_grid_y = self.screen_to_grid(mouse_x, mouse_y)
-                    for obj_id, rel_x, rel_y, rot, layer, mirror, skin in self.copied_parts:
-                        new_grid_x = base_grid_x + rel_x
-                        new_grid_y = base_grid_y + rel_y
-                        # Check if position is free
-                        if not any(part.grid_x == new_grid_x and part.grid_y == new_grid_y for part in self.parts_in_grid[layer]):
-                            new_part = Part(new_grid_x, new_grid_y, obj_id, layer, rot, mirror, skin)
-                            self.parts_in_grid[layer].append(new_part)
-            elif event.key == pygame.K_DELETE:
+                    self.place_parts((obj_id, base_grid_x + rel_x, base_grid_y + rel_y, rot, layer, mirror, skin)
+                                     for obj_id, rel_x, rel_y, rot, layer, mirror, skin in self.copied_parts)
+            elif event.key == pygame.K_z and pygame.key.get_mods() & pygame.KMOD_CTRL and not self.dragging:
+                if pygame.key.get_mods() & pygame.KMOD_SHIFT:
+                    self.redo()
+                else:
+                    self.undo()
+            elif event.key == pygame.K_y and pygame.key.get_mods() & pygame.KMOD_CTRL and not self.dragging:
+                self.redo()
+            elif event.key == pygame.K_b and not self.dragging and not self.stamping:
+                self.stamp_mode = not self.stamp_mode
+            elif event.key in (pygame.K_LEFTBRACKET, pygame.K_RIGHTBRACKET) and self.stamp_mode:
+                step = 1 if event.key == pygame.K_RIGHTBRACKET else -1
+                self.stamp_spacing = max(0, self.stamp_spacing + step)
+            elif event.key == pygame.K_DELETE and not self.dragging:
                 if self.selected_parts:
-                    for layer in range(len(self.parts_in_grid)):
-                        self.parts_in_grid[layer] = [part for part in self.parts_in_grid[layer] if not ( part in self.selected_parts)]
+                    self.remove_parts(list(self.selected_parts))
 
         if event.type == pygame.KEYUP:
             if event.key == pygame.K_w:
@@ -623,46 +1710,55 @@ class Grid():
                     # Start selection
                     self.selecting = True
                     self.selection_start = (mouse_x, mouse_y)
-                    self.selected_parts = []
+                    self.selected_parts = Selection()
+                elif self.stamp_mode:
+                    # Start the stamp rectangle
+                    self.stamping = True
+                    self.selection_start = (mouse_x, mouse_y)
                 else:
                     grid_x, grid_y = self.screen_to_grid(mouse_x, mouse_y)
                     # Check if clicking on a selected part to start dragging
                     clicked_part = None
-                    for part in self.selected_parts:
-                        if part.grid_x == grid_x and part.grid_y == grid_y:
-                            clicked_part = part
-                            break
+                    for layer in range(len(self.parts_in_grid)):
+                        for part in self.cell_parts(layer, grid_x, grid_y):
+                            if part in self.selected_parts:
+                                clicked_part = part
                     if clicked_part:
                         self.dragging = True
                         self.drag_start_grid = (grid_x, grid_y)
-                        self.drag_initial_positions = [(part.grid_x, part.grid_y) for part in self.selected_parts]
+                        self.drag_last_grid = (grid_x, grid_y)
+                        self.drag_parts = list(self.selected_parts)
+                        xs, ys, rotations, mirrors, object_ids = self.part_columns(self.drag_parts)
+                        self.drag_initial_positions = (xs, ys)
+                        self.drag_initial_rows = (object_ids, [part.skin for part in self.drag_parts], rotations, mirrors)
                     else:
                         layer = 0 if selected_part_id in [5, 6] else 1
                         # Check if there's already a part at this position on the layer
-                        if not any(part.grid_x == grid_x and part.grid_y == grid_y for part in self.parts_in_grid[layer]):
+                        if not self.is_occupied(layer, grid_x, grid_y):
                             # Create a new part at the clicked cell using selected_part_id
                             new_part = Part(grid_x, grid_y, selected_part_id, layer, skin=selected_skin)
-                            self.parts_in_grid[layer].append(new_part)
+                            self.add_part(new_part)
+                            self.commit_edit([], [self.part_row(new_part)])
 
-            elif event.button == 3:  # Right mouse button
+            elif event.button == 3 and not self.dragging:  # Right mouse button; removing parts mid-drag would strand them
                 mouse_x, mouse_y = event.pos
                 grid_x, grid_y = self.screen_to_grid(mouse_x, mouse_y)
                 # Remove parts at the clicked cell from all layers
+                removed = []
                 for layer in range(len(self.parts_in_grid)):
-                    self.parts_in_grid[layer] = [part for part in self.parts_in_grid[layer] if not (part.grid_x == grid_x and part.grid_y == grid_y)]
+                    for part in list(self.cell_parts(layer, grid_x, grid_y)):
+                        removed.append(self.part_row(part))
+                        self.remove_part(part)
+                self.commit_edit(removed, [])
         elif event.type == pygame.MOUSEMOTION:
             mouse_x, mouse_y = event.pos
-            if self.selecting:
+            if self.selecting or self.stamping:
                 start_x, start_y = self.selection_start
                 self.selection_rect = pygame.Rect(min(start_x, mouse_x), min(start_y, mouse_y), abs(mouse_x - start_x), abs(mouse_y - start_y))
             elif self.dragging:
                 current_grid_x, current_grid_y = self.screen_to_grid(mouse_x, mouse_y)
-                dx = current_grid_x - self.drag_start_grid[0]
-                dy = current_grid_y - self.drag_start_grid[1]
-                for i, part in enumerate(self.selected_parts):
-                    initial_x, initial_y = self.drag_initial_positions[i]
-                    part.grid_x = initial_x + dx
-                    part.grid_y = initial_y + dy
+                # The parts stay where they are until the drop; draw_drag_preview shows them moved
+                self.drag_last_grid = (current_grid_x, current_grid_y)
         elif event.type == pygame.MOUSEBUTTONUP:
             if event.button == 1:
                 if self.selecting:
@@ -674,18 +1770,36 @@ class Grid():
                     max_y = max(start_y, mouse_y)
                     start_grid_x, start_grid_y = self.screen_to_grid(min_x, min_y)
                     end_grid_x, end_grid_y = self.screen_to_grid(max_x, max_y)
-                    for layer in self.parts_in_grid:
-                        for part in layer:
-                            if start_grid_x <= part.grid_x <= end_grid_x and start_grid_y <= part.grid_y <= end_grid_y:
-                                if part not in self.selected_parts:
-                                    self.selected_parts.append(part)
+                    for layer in range(len(self.parts_in_grid)):
+                        for part in self.parts_in_rect(layer, start_grid_x, start_grid_y, end_grid_x, end_grid_y):
+                            self.selected_parts.add(part)
                     self.selecting = False
                     self.selection_rect = None
+                elif self.stamping:
+                    start_grid_x, start_grid_y = self.screen_to_grid(*self.selection_start)
+                    end_grid_x, end_grid_y = self.screen_to_grid(*event.pos)
+                    self.stamp(min(start_grid_x, end_grid_x), min(start_grid_y, end_grid_y),
+                               max(start_grid_x, end_grid_x), max(start_grid_y, end_grid_y), selected_part_id, selected_skin)
+                    self.stamping = False
+                    self.selection_rect = None
                 elif self.dragging:
+                    if self.drag_last_grid != self.drag_start_grid:
+                        # The whole drag is one edit, however many cells it crossed
+                        object_ids, skins, rotations, mirrors = self.drag_initial_rows
+                        xs, ys = self.drag_initial_positions
+                        new_xs, new_ys = transforms.translate(xs, ys, self.drag_last_grid[0] - self.drag_start_grid[0],
+                                                              self.drag_last_grid[1] - self.drag_start_grid[1])
+                        self.reindex_parts(self.drag_parts, xs, ys, new_xs, new_ys)
+                        self.selected_parts.invalidate_bounds()
+                        self.commit_edit(self.column_table(object_ids, skins, xs, ys, rotations, mirrors),
+                                         self.column_table(object_ids, skins, new_xs, new_ys, rotations, mirrors))
                     self.dragging = False
                     self.drag_start_grid = None
+                    self.drag_last_grid = None
+                    self.drag_parts = None
                     self.drag_initial_positions = None
+                    self.drag_initial_rows = None
 
 if __name__ == "__main__":
-   app = App()
+   app = App(profile_startup="--profile-startup" in sys.argv)
    app.run()
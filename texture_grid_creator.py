@@ -1,56 +1,139 @@
 from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+import argparse
 import os
-import math
-
-def create_texture_grid(folder_path):
-    # Supported image extensions
-    extensions = ('.png', '.jpg', '.jpeg')
-    
-    # Get all image files in the folder
-    image_files = [f for f in os.listdir(folder_path) if f.lower().endswith(extensions)]
-    
-    if not image_files:
+import re
+import texture_manifest
+
+# Supported image extensions
+EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def slot_of(file_name):
+    # "<id>.png" is the part texture for object <id>, "<id>_<n>.png" its skin n; anything else has no slot
+    match = re.fullmatch(r'(\d+)(?:_(\d+))?\.[^.]+', file_name)
+    if not match or int(match.group(1)) == 0 or match.group(2) is not None and int(match.group(2)) == 0:
+        return None
+    return int(match.group(1)), int(match.group(2) or 0)
+
+
+def decode(img_path, slot_size):
+    # Runs on a worker thread: returns the image fitted into one slot and whether it has any visible pixel
+    with Image.open(img_path) as img:
+        img = img.convert('RGBA')
+    if img.size != (slot_size, slot_size):
+        # Shrink if needed (keeping the aspect ratio) and center in the slot
+        img.thumbnail((slot_size, slot_size))
+        slot = Image.new('RGBA', (slot_size, slot_size), (0, 0, 0, 0))
+        slot.paste(img, ((slot_size - img.width) // 2, (slot_size - img.height) // 2))
+        img = slot
+    return img, img.getchannel('A').getbbox() is not None
+
+
+def decoded_images(folder_path, image_files, slot_size, workers):
+    # Decode in parallel, but keep at most a few images per worker in memory at once
+    window = max(1, workers) * 4
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(image_files), window):
+            batch = image_files[start:start + window]
+            paths = [os.path.join(folder_path, file) for file in batch]
+            yield from zip(batch, pool.map(decode, paths, [slot_size] * len(batch)))
+
+
+def atlas_name(output_name, index):
+    return f"{output_name}.png" if index == 0 else f"{output_name}_{index + 1}.png"
+
+
+def create_texture_grid(folder_path, output_name='texture_grid', slot_size=108, max_size=4096, workers=None):
+    # Slots are addressed, not packed: object <id> goes to slot <id> of the parts atlas and its
+    # skin <n> to slot <n> of <id>_skin.png, the way Grid reads them; missing numbers stay empty
+    outputs = re.escape(output_name) + r'(_\d+)?\.png|\d+_skin(_\d+)?\.png'
+    parts = {}
+    skins = {}
+    for file in sorted(os.listdir(folder_path)):
+        if not file.lower().endswith(EXTENSIONS) or re.fullmatch(outputs, file):
+            continue
+        slot = slot_of(file)
+        if slot is None:
+            print(f"Skipped {file}: not named <object id> or <object id>_<skin number>")
+            continue
+        object_id, skin = slot
+        images = skins.setdefault(object_id, {}) if skin else parts
+        number = skin or object_id
+        if number in images:
+            print(f"Skipped {file}: slot {number} already taken by {images[number]}")
+            continue
+        images[number] = file
+    if not parts and not skins:
         print("No image files found in the folder.")
         return
-    
-    # Load images and check sizes (assume all are the same)
-    images = []
-    for file in image_files:
-        img_path = os.path.join(folder_path, file)
-        img = Image.open(img_path)
-        images.append(img)
-    
-    # Assume all images are the same size
-    if not images:
-        return
-    img_width, img_height = images[0].size
-    
-    # Calculate grid dimensions (aim for square)
-    num_images = len(images)
-    grid_size = math.ceil(math.sqrt(num_images))
-    grid_width = grid_size * img_width
-    grid_height = grid_size * img_height
-    
-    # Create a new blank image for the grid
-    grid = Image.new('RGBA', (grid_width, grid_height), (0, 0, 0, 0))  # Transparent background
-    
-    # Place images in the grid
-    for i, img in enumerate(images):
-        row = i // grid_size
-        col = i % grid_size
-        x = col * img_width
-        y = row * img_height
-        grid.paste(img, (x, y))
-    
-    # Save the grid
-    output_path = os.path.join(folder_path, 'texture_grid.png')
+    workers = workers or os.cpu_count() or 1
+
+    manifest = texture_manifest.load_manifest(folder_path)
+    atlas_count = 0
+    if parts:
+        atlas_count += pack_atlases(folder_path, output_name, parts, slot_size, max_size, workers, manifest)
+    for object_id, images in sorted(skins.items()):
+        atlas_count += pack_atlases(folder_path, f"{object_id}_skin", images, slot_size, max_size, workers, manifest)
+    texture_manifest.save_manifest(folder_path, manifest)
+    image_count = len(parts) + sum(len(images) for images in skins.values())
+    print(f"Packed {image_count} images into {atlas_count} atlas(es); manifest saved as "
+          f"{os.path.join(folder_path, texture_manifest.MANIFEST_NAME)}")
+
+
+def pack_atlases(folder_path, name, images, slot_size, max_size, workers, manifest):
+    # images: {slot number: file}. Fixed-width atlases of at most max_size x max_size, each
+    # only as tall as its highest used slot; slots past the first atlas go to <name>_2.png, ...
+    cols = max(1, max_size // slot_size)
+    per_atlas = cols * max(1, max_size // slot_size)
+    numbers = sorted(images)
+    files = [images[number] for number in numbers]
+    last_slot = {}
+    for number in numbers:
+        last_slot[(number - 1) // per_atlas] = (number - 1) % per_atlas + 1
+    grid = None
+    atlas_index = None
+    slots = []
+    sources = {}
+    written = 0
+    for number, (file, (img, non_empty)) in zip(numbers, decoded_images(folder_path, files, slot_size, workers)):
+        index, slot = divmod(number - 1, per_atlas)
+        slot += 1  # 1-based, numbered the way Grid reads atlases
+        if index != atlas_index:
+            if grid is not None:
+                save_atlas(folder_path, atlas_name(name, atlas_index), grid, manifest, slots, sources)
+                written += 1
+            rows = (last_slot[index] + cols - 1) // cols
+            grid = Image.new('RGBA', (cols * slot_size, rows * slot_size), (0, 0, 0, 0))  # Transparent background
+            atlas_index = index
+            slots = []
+            sources = {}
+        grid.paste(img, ((slot - 1) % cols * slot_size, (slot - 1) // cols * slot_size))
+        sources[slot] = file
+        if non_empty:
+            slots.append(slot)
+    save_atlas(folder_path, atlas_name(name, atlas_index), grid, manifest, slots, sources)
+    return written + 1
+
+
+def save_atlas(folder_path, filename, grid, manifest, slots, sources):
+    output_path = os.path.join(folder_path, filename)
     grid.save(output_path)
+    # Recorded after saving: the manifest entry is keyed to the written file's mtime and size
+    texture_manifest.record_slots(manifest, folder_path, filename, slots, sources)
     print(f"Texture grid saved as {output_path}")
 
+
 # Main execution
 if __name__ == "__main__":
-    folder_path = "for_tgc"
-    if os.path.isdir(folder_path):
-        create_texture_grid(folder_path)
+    parser = argparse.ArgumentParser(description="Pack <id>.png part images and <id>_<skin>.png skin images into texture atlases plus a slot manifest.")
+    parser.add_argument("folder_path", nargs="?", default="for_tgc")
+    parser.add_argument("--output-name", default="texture_grid", help="Atlas file name without .png; extra atlases get _2, _3, ...")
+    parser.add_argument("--slot-size", type=int, default=108)
+    parser.add_argument("--max-size", type=int, default=4096, help="Maximum atlas width and height in pixels")
+    parser.add_argument("--workers", type=int, default=None, help="Decoding threads (default: CPU count)")
+    args = parser.parse_args()
+    if os.path.isdir(args.folder_path):
+        create_texture_grid(args.folder_path, args.output_name, args.slot_size, args.max_size, args.workers)
     else:
         print("Invalid folder path.")
@@ -0,0 +1,52 @@
+import json
+import os
+
+# Cached description of the texture atlases: which 108x108 slots hold a texture. Lets the
+# editor skip probing every slot with get_bounding_rect at startup. An entry is trusted only
+# while its atlas keeps the recorded mtime and size.
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+def load_manifest(directory):
+    path = os.path.join(directory, MANIFEST_NAME)
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': MANIFEST_VERSION, 'atlases': {}}
+    if manifest.get('version') != MANIFEST_VERSION or not isinstance(manifest.get('atlases'), dict):
+        return {'version': MANIFEST_VERSION, 'atlases': {}}
+    return manifest
+
+
+def save_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST_NAME)
+    try:
+        with open(path, 'w') as f:
+            json.dump(manifest, f, sort_keys=True)
+    except OSError as e:
+        print(f"Could not write texture manifest {path}: {e}")
+
+
+def current_slots(manifest, directory, filename):
+    # Non-empty slot numbers (1-based) recorded for an atlas, or None if missing or stale
+    entry = manifest['atlases'].get(filename)
+    if not entry:
+        return None
+    try:
+        stat = os.stat(os.path.join(directory, filename))
+    except OSError:
+        return None
+    if entry.get('mtime') != stat.st_mtime or entry.get('size') != stat.st_size:
+        return None
+    return entry.get('slots')
+
+
+def record_slots(manifest, directory, filename, slots, sources=None):
+    # sources: optional {slot: image file name} written by the atlas packer, for reference only
+    stat = os.stat(os.path.join(directory, filename))
+    entry = {'mtime': stat.st_mtime, 'size': stat.st_size, 'slots': list(slots)}
+    if sources:
+        entry['sources'] = {str(slot): name for slot, name in sources.items()}
+    manifest['atlases'][filename] = entry
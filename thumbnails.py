@@ -0,0 +1,115 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # Offscreen: no window is ever shown
+import argparse
+import fnmatch
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pygame
+import transforms
+from main import Grid
+
+# Renders a PNG preview of every contraption in a directory with the editor's own drawing
+# code (atlases, skins, rotation and mirror rules, layer order).
+# Usage: python thumbnails.py INPUT_DIR OUTPUT_DIR [--size PIXELS] [--workers N] [--pattern GLOB] [--force]
+
+worker_grid = None  # One Grid per process, so textures and scaled copies are reused between files
+
+
+def init_worker():
+    global worker_grid
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))  # convert_alpha needs a display mode, even a dummy one
+    worker_grid = Grid()
+
+
+def render_thumbnail(grid, size):
+    # Fit every part into a size x size transparent image, centered
+    surface = pygame.Surface((size, size), pygame.SRCALPHA)
+    parts = [part for layer in grid.parts_in_grid for part in layer]
+    if not parts:
+        return surface
+    xs, ys, _, _, object_ids = grid.part_columns(parts)
+    min_x, min_y, max_x, max_y = transforms.bounds_of(xs, ys)
+    # One spare cell per axis for 45 degree textures that overhang their cell
+    cells = max(max_x - min_x, max_y - min_y) + 2
+    if cells > size:
+        draw_binned(grid, surface, xs - min_x, ys - min_y, object_ids, max(max_x - min_x, max_y - min_y) + 1)
+        return surface
+    cell_size_zoomed = size // cells
+    grid.zoom = (cell_size_zoomed + 0.5) / grid.cell_size
+    grid.offset_x = min_x * cell_size_zoomed - (size - (max_x - min_x + 1) * cell_size_zoomed) // 2
+    grid.offset_y = min_y * cell_size_zoomed - (size - (max_y - min_y + 1) * cell_size_zoomed) // 2
+    # A one-off render: drawing parts directly beats filling the chunk cache
+    grid.draw_parts(surface, int(grid.cell_size * grid.zoom), use_chunks=False)
+    return surface
+
+
+def draw_binned(grid, surface, xs, ys, object_ids, span):
+    # More cells than pixels: several cells share one flat-colored pixel, as in the library
+    # thumbnails, so memory stays at size x size however far apart the parts are
+    size = surface.get_width()
+    width = (int(xs.max()) + 1) * size // span
+    height = (int(ys.max()) + 1) * size // span
+    # Parts come in layer order, so later (upper) layers win a shared pixel
+    unique_ids, inverse = np.unique(object_ids, return_inverse=True)
+    palette = np.array([grid.get_object_color(object_id)[:3] for object_id in unique_ids.tolist()], dtype=np.uint8).reshape(-1, 3)
+    pixels = (xs * size // span + (size - width) // 2, ys * size // span + (size - height) // 2)
+    rgb = pygame.surfarray.pixels3d(surface)
+    rgb[pixels] = palette[inverse]
+    del rgb
+    alpha = pygame.surfarray.pixels_alpha(surface)
+    alpha[pixels] = 255
+    del alpha  # Unlock the surface for saving
+
+
+def process_file(source, target, size):
+    try:
+        worker_grid.load(source)
+        pygame.image.save(render_thumbnail(worker_grid, size), target)
+        return source, None
+    except Exception as e:
+        return source, f"{type(e).__name__}: {e}"
+
+
+def is_stale(source, target):
+    return not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render PNG thumbnails of a directory of contraption files.")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--size", type=int, default=256, help="Thumbnail width and height in pixels")
+    parser.add_argument("--pattern", default="*", help="Only render file names matching this glob")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Render even if the thumbnail is newer than the file")
+    args = parser.parse_args()
+
+    names = sorted(name for name in os.listdir(args.input_dir)
+                   if fnmatch.fnmatch(name, args.pattern) and os.path.isfile(os.path.join(args.input_dir, name)))
+    jobs = [(os.path.join(args.input_dir, name), os.path.join(args.output_dir, os.path.splitext(name)[0] + ".png"))
+            for name in names]
+    todo = [(source, target) for source, target in jobs if args.force or is_stale(source, target)]
+    print(f"{len(todo)} of {len(jobs)} thumbnails to render ({len(jobs) - len(todo)} up to date)")
+    if not todo:
+        return 0
+    os.makedirs(args.output_dir, exist_ok=True)
+    # Build the texture manifest here once, so the workers don't all probe the atlases and write it
+    init_worker()
+    started = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+        futures = [pool.submit(process_file, source, target, args.size) for source, target in todo]
+        for future in as_completed(futures):
+            source, error = future.result()
+            if error:
+                failed += 1
+                print(f"{source}: FAILED {error}")
+    seconds = time.perf_counter() - started
+    print(f"Rendered {len(todo) - failed}/{len(todo)} thumbnails in {seconds:.2f}s ({len(todo) / max(seconds, 1e-9):.1f} files/s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,56 @@
+import numpy as np
+
+EIGHT_WAY_IDS = [39, 45]  # Parts with 45 degree steps (rotation 0-7)
+FLIP_ROTATED_IDS = [12, 13, 14, 15, 16, 17, 18, 37]  # Parts whose rotation gets +2 when flipped
+MIRRORABLE_IDS = [33, 34, 35, 36]  # Parts that toggle mirror when flipped
+
+
+def bounds_of(xs, ys):
+    return int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max())
+
+
+def rotate_cw(xs, ys, rotations, object_ids, bounds=None):
+    # Rotate positions 90 degrees clockwise around the bounding box center and turn
+    # every part one step counterclockwise. Returns new xs, ys, rotations and bounds.
+    min_x, min_y, max_x, max_y = bounds if bounds is not None else bounds_of(xs, ys)
+    cx = (min_x + max_x) // 2
+    cy = (min_y + max_y) // 2
+    new_xs = cx + (ys - cy)
+    new_ys = cy - (xs - cx)
+    eight_way = np.isin(object_ids, EIGHT_WAY_IDS)
+    new_rotations = np.where(eight_way, (rotations + 2) % 8, (rotations + 1) % 4)
+    # Keep the center fixed; the rotated box follows from the old one
+    new_min_x = cx + (min_y - cy)
+    new_max_x = cx + (max_y - cy)
+    new_min_y = cy - (max_x - cx)
+    new_max_y = cy - (min_x - cx)
+    shift_x = cx - (new_min_x + new_max_x) // 2
+    shift_y = cy - (new_min_y + new_max_y) // 2
+    new_bounds = (new_min_x + shift_x, new_min_y + shift_y, new_max_x + shift_x, new_max_y + shift_y)
+    return new_xs + shift_x, new_ys + shift_y, new_rotations, new_bounds
+
+
+def flip_horizontal(xs, rotations, mirrors, object_ids, bounds):
+    # Reflect positions over the vertical axis through the bounding box center and
+    # adjust orientations. Returns new xs, rotations, mirrors and bounds.
+    min_x, min_y, max_x, max_y = bounds
+    cx = (min_x + max_x) // 2
+    new_xs = 2 * cx - xs
+    new_mirrors = np.where(np.isin(object_ids, MIRRORABLE_IDS), ~mirrors, mirrors)
+    # Same rules as the per-part code: note the +2 is not wrapped back into 0-3
+    flipped = (4 - rotations) % 4
+    new_rotations = np.where(np.isin(object_ids, FLIP_ROTATED_IDS), flipped + 2, flipped)
+    new_min_x = 2 * cx - max_x
+    new_max_x = 2 * cx - min_x
+    shift_x = cx - (new_min_x + new_max_x) // 2
+    return new_xs + shift_x, new_rotations, new_mirrors, (new_min_x + shift_x, min_y, new_max_x + shift_x, max_y)
+
+
+def translate(xs, ys, dx, dy):
+    return xs + dx, ys + dy
+
+
+def relative_offsets(xs, ys, bounds=None):
+    # Offsets from the top-left corner of the bounding box, as used by the clipboard
+    min_x, min_y, _, _ = bounds if bounds is not None else bounds_of(xs, ys)
+    return xs - min_x, ys - min_y